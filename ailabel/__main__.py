@@ -1,4 +1,4 @@
-from entrypoints.cli import app
+from ailabel.entrypoints.cli import app
 
 if __name__ == "__main__":
     app()
@@ -4,17 +4,45 @@ This module provides Create, Read, Update, and Delete operations for the databas
 All functions use the `with_session` decorator to handle database sessions automatically.
 
 The module includes operations for:
-- Creating and retrieving topics
+- Creating (idempotently) and retrieving topics
 - Creating and retrieving labels
-- Creating and retrieving labeled payloads
+- Creating and retrieving labeled payloads, individually or in bulk
 - Getting statistics and checking existence of data
 """
 
+from itertools import batched
 from typing import Optional
+from sqlalchemy import func, insert, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import raiseload, selectinload
 from sqlmodel import Session, select
-from .models import Topic, Label, LabeledPayload
+from .models import Topic, Label, LabeledPayload, utc_now_us
 from .database import with_session
 
+# Rows per executemany in create_labeled_payloads_bulk (SQLite's historical variable limit)
+BULK_INSERT_CHUNK_SIZE = 999
+
+# Built once so repeated inserts reuse the same statement and its compiled form
+_LP_INSERT = insert(LabeledPayload)
+
+# Bumped whenever labeled payloads are written by this process, so callers that cache
+# derived data (e.g. prediction context) can key on it and never serve stale results.
+_labeled_payloads_version = 0
+
+
+def labeled_payloads_version() -> int:
+    """Get a counter that changes whenever this process stores labeled payloads.
+
+    Returns:
+        The current labeled-payload write version
+    """
+    return _labeled_payloads_version
+
+
+def _bump_labeled_payloads_version() -> None:
+    global _labeled_payloads_version
+    _labeled_payloads_version += 1
+
 
 @with_session
 def create_topic(session: Session, name: str) -> Topic:
@@ -37,6 +65,23 @@ def create_topic(session: Session, name: str) -> Topic:
     return topic
 
 
+@with_session
+def ensure_topic(session: Session, name: str) -> bool:
+    """Create a topic unless it already exists, in a single statement.
+
+    Args:
+        session: The database session
+        name: The name of the topic
+
+    Returns:
+        True if the topic was created, False if it already existed
+    """
+    statement = sqlite_insert(Topic).values(name=name).on_conflict_do_nothing()
+    created = session.exec(statement).rowcount == 1
+    session.commit()
+    return created
+
+
 @with_session
 def create_label(session: Session, name: str, topic_name: str) -> Label:
     """Create a new label for a topic.
@@ -70,20 +115,58 @@ def create_labeled_payload(session: Session, payload: str, label_name: str, topi
         topic_name: The name of the topic this labeled payload belongs to
 
     Returns:
-        The created LabeledPayload object
+        The created LabeledPayload object. It is not attached to the session, so
+        its relationships are not loaded.
 
     Raises:
         IntegrityError: If the label or topic doesn't exist
     """
-    labeled_payload = LabeledPayload(
-        payload=payload,
-        label_name=label_name,
-        topic_name=topic_name,
-    )
-    session.add(labeled_payload)
+    values = {
+        "payload": payload,
+        "label_name": label_name,
+        "topic_name": topic_name,
+        "created_at": utc_now_us(),
+    }
+    # RETURNING hands back the generated id, so no refresh SELECT is needed
+    statement = _LP_INSERT.values(**values).returning(LabeledPayload.id)
+    new_id = session.execute(statement).scalar_one()
+    session.commit()
+    _bump_labeled_payloads_version()
+    return LabeledPayload(id=new_id, **values)
+
+
+@with_session
+def create_labeled_payloads_bulk(session: Session, payloads: list[tuple[str, str, str]]) -> int:
+    """Store many labeled payloads in a single transaction.
+
+    Rows are inserted with Core executemany rather than as ORM objects, so no
+    per-row flush bookkeeping or refresh happens.
+
+    Args:
+        session: The database session
+        payloads: (payload, label_name, topic_name) tuples to store
+
+    Returns:
+        The number of labeled payloads stored
+
+    Raises:
+        IntegrityError: If a label or topic doesn't exist
+    """
+    rows = [
+        {
+            "payload": payload,
+            "label_name": label_name,
+            "topic_name": topic_name,
+            "created_at": utc_now_us(),
+        }
+        for payload, label_name, topic_name in payloads
+    ]
+    # One executemany per chunk, all inside a single transaction
+    for chunk in batched(rows, BULK_INSERT_CHUNK_SIZE):
+        session.execute(_LP_INSERT, list(chunk))
     session.commit()
-    session.refresh(labeled_payload)
-    return labeled_payload
+    _bump_labeled_payloads_version()
+    return len(payloads)
 
 
 @with_session
@@ -100,6 +183,20 @@ def get_all_topics(session: Session) -> list[Topic]:
     return session.exec(statement).all()
 
 
+@with_session
+def count_topics(session: Session) -> int:
+    """Count topics without loading them.
+
+    Args:
+        session: The database session
+
+    Returns:
+        The number of topics in the database
+    """
+    statement = select(func.count()).select_from(Topic)
+    return session.exec(statement).one()
+
+
 @with_session
 def get_topic(session: Session, name: str) -> Optional[Topic]:
     """Get a specific topic by name.
@@ -146,14 +243,12 @@ def get_label_statistics(session: Session, topic_name: str) -> dict[str, int]:
         >>> get_label_statistics(session, "sentiment")
         {'positive': 42, 'negative': 28, 'neutral': 30}
     """
-    statement = select(LabeledPayload).where(LabeledPayload.topic_name == topic_name)
-    payloads = session.exec(statement).all()
-
-    stats = {}
-    for payload in payloads:
-        stats[payload.label_name] = stats.get(payload.label_name, 0) + 1
-
-    return stats
+    statement = (
+        select(LabeledPayload.label_name, func.count())
+        .where(LabeledPayload.topic_name == topic_name)
+        .group_by(LabeledPayload.label_name)
+    )
+    return dict(session.exec(statement).all())
 
 
 @with_session
@@ -167,7 +262,7 @@ def topic_exists(session: Session, name: str) -> bool:
     Returns:
         True if the topic exists, False otherwise
     """
-    statement = select(Topic).where(Topic.name == name)
+    statement = select(literal(True)).where(Topic.name == name).limit(1)
     return session.exec(statement).first() is not None
 
 
@@ -175,22 +270,53 @@ def topic_exists(session: Session, name: str) -> bool:
 def get_recent_labeled_payloads(
     session: Session,
     topic_name: str,
-    limit: int = 10,
+    limit: int = 20,
 ) -> list[LabeledPayload]:
     """Get recent labeled payloads for a topic.
 
     Args:
         session: The database session
         topic_name: The name of the topic to get payloads for
-        limit: Maximum number of payloads to return (default: 10)
+        limit: Maximum number of payloads to return (default: 20)
 
     Returns:
-        A list of LabeledPayload objects ordered by creation date (newest first)
+        A list of LabeledPayload objects ordered by creation date (newest first), with
+        `label` and `topic` loaded. Other relationships raise instead of lazy loading.
     """
     statement = (
         select(LabeledPayload)
         .where(LabeledPayload.topic_name == topic_name)
         .order_by(LabeledPayload.created_at.desc())
         .limit(limit)
+        # Load both parents in one extra query each; any other lazy load raises
+        .options(
+            selectinload(LabeledPayload.label),
+            selectinload(LabeledPayload.topic),
+            raiseload("*"),
+        )
     )
     return session.exec(statement).all()
+
+
+@with_session
+def get_recent_examples(session: Session, topic_name: str, limit: int = 20) -> list[tuple[str, str]]:
+    """Get the payload and label of recent labeled payloads for a topic.
+
+    Only the two needed columns are selected, so no ORM objects or relationships
+    are loaded.
+
+    Args:
+        session: The database session
+        topic_name: The name of the topic to get examples for
+        limit: Maximum number of examples to return (default: 20)
+
+    Returns:
+        A list of (payload, label_name) tuples ordered by creation date (newest first)
+    """
+    statement = (
+        select(LabeledPayload.payload, LabeledPayload.label_name)
+        .where(LabeledPayload.topic_name == topic_name)
+        .order_by(LabeledPayload.created_at.desc())
+        .limit(limit)
+    )
+    return [tuple(row) for row in session.exec(statement)]
@@ -4,9 +4,10 @@ This module provides the database connection, session management,
 and a decorator for handling database sessions in CRUD operations.
 
 The module:
-1. Sets up the SQLite database in a user-specific location
-2. Initializes the database schema based on the models
+1. Sets up the SQLite database in a user-specific location, in WAL mode
+2. Initializes the database schema based on the models, once per schema version
 3. Provides a `with_session` decorator that automatically creates and manages database sessions
+4. Provides a `session_scope` context manager that shares one session across decorated calls
 
 Usage:
     @with_session
@@ -20,10 +21,20 @@ Usage:
     # Or provide an existing session
     with Session(engine) as session:
         result = my_db_function("value1", 42, session=session)
+
+    # Or share one session across several calls
+    with session_scope():
+        result = my_db_function("value1", 42)
+        other = my_db_function("value2", 43)
 """
 
 # ruff: noqa: F401
-from typing import Callable, Concatenate
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Concatenate, Iterator
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel, create_engine, Session
 from pathlib import Path
 
@@ -31,10 +42,129 @@ from ailabel.db import models  # intentional to have models for metadata.create_
 
 data_dir = Path.home() / ".local" / "share" / "ailabel"
 data_dir.mkdir(parents=True, exist_ok=True)
-sqlite_url = f"sqlite:///{data_dir}/labels.db"
-engine = create_engine(sqlite_url)
+db_path = data_dir / "labels.db"
+sqlite_url = f"sqlite:///{db_path}"
+# Bump when the models change so existing databases are migrated on next start
+schema_marker = data_dir / ".schema_v2"
+engine = create_engine(sqlite_url, pool_size=5, pool_pre_ping=True)
+# Objects returned from CRUD functions stay usable after commit without a reload
+SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+_ambient_session: ContextVar[Session | None] = ContextVar("ailabel_session", default=None)
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Configure each new SQLite connection for fast writes.
+
+    WAL lets readers and a writer proceed concurrently, and with synchronous=NORMAL
+    a commit no longer waits on an fsync; WAL checkpoints do instead.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+
+event.listen(engine, "connect", set_sqlite_pragmas)
+
+def migrate_labeled_payload_ids(engine) -> None:
+    """Rebuild a pre-existing labeledpayload table that still uses TEXT UUID ids.
+
+    Rows are copied in creation order and receive new integer ids.
+    """
+    with engine.begin() as connection:
+        columns = connection.exec_driver_sql("PRAGMA table_info(labeledpayload)").all()
+        id_type = next((column[2] for column in columns if column[1] == "id"), "INTEGER")
+        if id_type.upper() == "INTEGER":
+            return
+        connection.exec_driver_sql("ALTER TABLE labeledpayload RENAME TO labeledpayload_old")
+        # The renamed table keeps its index names; drop them so create_all can reuse them
+        for (index_name,) in connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'labeledpayload_old'"
+            " AND sql IS NOT NULL"
+        ).all():
+            connection.exec_driver_sql(f'DROP INDEX "{index_name}"')
+        models.LabeledPayload.__table__.create(connection)
+        connection.exec_driver_sql(
+            "INSERT INTO labeledpayload (payload, label_name, topic_name, created_at) "
+            "SELECT payload, label_name, topic_name, created_at FROM labeledpayload_old "
+            "ORDER BY created_at"
+        )
+        connection.exec_driver_sql("DROP TABLE labeledpayload_old")
+
+
+def migrate_created_at_to_epoch(engine) -> None:
+    """Convert text `created_at` timestamps to integer microseconds since the epoch.
+
+    Stored datetimes are naive UTC. They are converted in Python because SQLite's
+    date functions only keep millisecond precision.
+    """
+    with engine.begin() as connection:
+        table = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'labeledpayload'"
+        ).first()
+        if table is None:
+            return
+        rows = connection.exec_driver_sql(
+            "SELECT id, created_at FROM labeledpayload WHERE typeof(created_at) = 'text'"
+        ).all()
+        if not rows:
+            return
+        epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        one_us = timedelta(microseconds=1)
+        connection.exec_driver_sql(
+            "UPDATE labeledpayload SET created_at = ? WHERE id = ?",
+            [
+                ((datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc) - epoch) // one_us, row_id)
+                for row_id, created_at in rows
+            ],
+        )
+
+
+def init_schema(engine, marker: Path, db_file: Path) -> None:
+    """Create and migrate the schema unless `marker` shows it is already current.
+
+    Checking every table and index on each start costs a query apiece, so it is
+    only done on first run and after the marker's schema version is bumped.
+    Indexes are created separately because create_all skips tables that exist.
+    """
+    if marker.exists() and db_file.exists():
+        return
+    migrate_labeled_payload_ids(engine)
+    migrate_created_at_to_epoch(engine)
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+    marker.touch()
+
+
+init_schema(engine, schema_marker, db_path)
 
-SQLModel.metadata.create_all(engine)
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """Share one session across all `with_session` calls made inside the block.
+
+    Nested scopes reuse the outer session. Without a scope, each decorated call
+    opens and closes its own session.
+
+    Yields:
+        The shared session
+    """
+    session = _ambient_session.get()
+    if session is not None:
+        yield session
+        return
+    with SessionLocal() as session:
+        token = _ambient_session.set(session)
+        try:
+            yield session
+        finally:
+            _ambient_session.reset(token)
 
 
 def with_session[T, **P](func: Callable[Concatenate[Session, P], T]) -> Callable[P, T]:
@@ -42,7 +172,8 @@ def with_session[T, **P](func: Callable[Concatenate[Session, P], T]) -> Callable
 
     This decorator wraps a function that requires a database session.
     If a session is provided when calling the function, it will be used.
-    Otherwise, a new session will be created and automatically closed when done.
+    Otherwise the session of an enclosing `session_scope` is used, and failing that
+    a new session is created and automatically closed when done.
 
     Args:
         func: The function to wrap, which should take a Session as its first parameter
@@ -60,9 +191,11 @@ def with_session[T, **P](func: Callable[Concatenate[Session, P], T]) -> Callable
     """
 
     def wrapper(*args: P.args, session=None, **kwargs: P.kwargs) -> T:
+        if session is None:
+            session = _ambient_session.get()
         if session is not None:
             return func(session, *args, **kwargs)
-        with Session(engine) as s:
+        with SessionLocal() as s:
             return func(s, *args, **kwargs)
 
     return wrapper
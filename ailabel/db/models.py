@@ -7,13 +7,22 @@ This module defines the SQLModel classes that represent the database schema:
 
 These models form the core data structure of the application and define
 the relationships between topics, labels, and labeled data.
+
+All relationships use SQLAlchemy's default lazy="select" loading, which issues a
+query per object on first access. Queries that return many rows whose
+relationships are used should eager-load them with `selectinload` (see crud).
 """
 
-import uuid
+import time
 from typing import Optional
 
+from sqlalchemy import BigInteger, Index
 from sqlmodel import Field, SQLModel, Relationship
-from datetime import datetime
+
+
+def utc_now_us() -> int:
+    """Current time as integer microseconds since the Unix epoch."""
+    return time.time_ns() // 1000
 
 
 class Topic(SQLModel, table=True):
@@ -44,6 +53,11 @@ class Label(SQLModel, table=True):
         topic: The related topic object
         examples: Labeled examples with this label
     """
+    __table_args__ = (
+        # Serves get_labels_for_topic
+        Index("ix_label_topic", "topic_name"),
+    )
+
     name: str = Field(primary_key=True)
     topic_name: str = Field(foreign_key="topic.name")
     topic: Optional[Topic] = Relationship(back_populates="labels")
@@ -57,19 +71,27 @@ class LabeledPayload(SQLModel, table=True):
     within a specific topic. This is the core data used for training and prediction.
     
     Attributes:
-        id: Unique identifier for the labeled payload
+        id: Unique, auto-incrementing identifier for the labeled payload
         payload: The text content being labeled
         label_name: The name of the assigned label
         topic_name: The name of the topic
-        created_at: When the labeled payload was created
+        created_at: When the labeled payload was created, in microseconds since the Unix epoch
         label: The related label object
         topic: The related topic object
     """
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
+    __table_args__ = (
+        # Covers the GROUP BY in get_label_statistics without touching the table
+        Index("ix_lp_topic_label", "topic_name", "label_name"),
+        # Serves get_recent_labeled_payloads as an index range scan, no sort needed
+        Index("ix_lp_topic_created_at", "topic_name", "created_at"),
+    )
+
+    # INTEGER PRIMARY KEY aliases SQLite's rowid: no separate key index, assigned on insert
+    id: Optional[int] = Field(default=None, primary_key=True)
     payload: str
     label_name: str = Field(foreign_key="label.name")
     topic_name: str = Field(foreign_key="topic.name")
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: int = Field(default_factory=utc_now_us, sa_type=BigInteger)
 
     label: Optional[Label] = Relationship(back_populates="examples")
     topic: Optional[Topic] = Relationship(back_populates="examples")
@@ -1,46 +1,224 @@
-import dotenv
-
-# Load API key from environment variables
-dotenv.load_dotenv()
-dotenv.load_dotenv(".env.secret")
-
+import contextlib
+import functools
 import sys
+from itertools import batched
 from typing import Annotated
 import typer
-from ailabel.db.crud import (
-    create_topic,
-    get_label_statistics,
-    create_labeled_payload,
-    topic_exists,
-)
-from ailabel.label_prediction import label_payload
 
+# Imports of ailabel.db and ailabel.predictions are intentionally deferred to the
+# functions that use them. Importing them creates the SQLite engine and loads the
+# Gemini SDK, which `label --help` and shell completion should never pay for.
+# Keep package __init__ modules free of re-exports for the same reason.
 
-def _ensure_stdin_passed():
-    import sys
+# Lines read from stdin per chunk in --batch mode
+BATCH_CHUNK_SIZE = 32
 
+
+def _ensure_stdin_passed():
     if sys.stdin.isatty():
         typer.echo("Error: No input provided on stdin", err=True)
         raise typer.Exit(code=1)
 
 
+@functools.lru_cache(maxsize=64)
+def _topic_exists(name: str) -> bool:
+    """
+    Memoized topic existence check. Topics are only created by this process through
+    `ensure_topic`, after which the cache is cleared.
+    """
+    from ailabel.db.crud import topic_exists
+
+    return topic_exists(name=name)
+
+
 def _display_topic_details(topic_name: str):
     """
     Show information about a specific topic.
     Usage: label topics info <topic_name> [--labels]
     """
+    from ailabel.db.crud import get_label_statistics
+
     # Check if topic exists
-    if not topic_exists(name=topic_name):
+    if not _topic_exists(topic_name):
         typer.echo(f"Error: Topic '{topic_name}' does not exist.")
         raise typer.Exit(code=1)
 
     typer.echo(f'Topic: "{topic_name}"')
 
     stats = get_label_statistics(topic_name=topic_name)
-    typer.echo("\nLabel statistics:")
-    for label, count in stats.items():
-        typer.echo(f"- {label}: {count}")
-    typer.echo(f"Total labeled payloads: {sum(stats.values())}")
+    lines = ["\nLabel statistics:"]
+    lines += [f"- {label}: {count}" for label, count in stats.items()]
+    lines.append(f"Total labeled payloads: {sum(stats.values())}")
+    typer.echo("\n".join(lines))
+
+
+def _interactive_labeling(topic: str, commit_every: int, fast_entry: bool = False):
+    """
+    Prompt for payload/label pairs until an empty payload, EOF or Ctrl-C.
+    With `fast_entry`, each pair is entered on one line as payload<TAB>label.
+    Labels are buffered and committed in one transaction every `commit_every` records,
+    and any pending records are committed before exiting. Ctrl-C exits with code 130.
+    """
+    from ailabel.db.crud import create_labeled_payloads_bulk
+
+    pending: list[tuple[str, str, str]] = []
+    recorded = 0
+
+    def flush():
+        nonlocal pending, recorded
+        if not pending:
+            return
+        try:
+            recorded += create_labeled_payloads_bulk(pending)
+        except Exception as e:
+            typer.echo(f"\nError: Failed to save {len(pending)} labels: {e}", err=True)
+            for payload_input, label_input, _ in pending:
+                typer.echo(f'Not saved: "{payload_input}" -> "{label_input}"', err=True)
+            raise typer.Exit(code=1)
+        pending = []
+
+    interrupted = False
+    try:
+        while True:
+            if fast_entry:
+                line = typer.prompt("payload<TAB>label", default="", show_default=False)
+                if not line:
+                    break
+                payload_input, _, label_input = line.partition("\t")
+                if not label_input:
+                    typer.echo("Error: Expected a payload and a label separated by a tab", err=True)
+                    continue
+            else:
+                payload_input = typer.prompt("Enter payload", default="", show_default=False)
+                if not payload_input:
+                    break
+                label_input = typer.prompt("Enter label")
+            pending.append((payload_input, label_input, topic))
+            if len(pending) >= commit_every:
+                flush()
+    except KeyboardInterrupt:
+        interrupted = True
+    except typer.Abort as e:
+        # typer.prompt converts both EOF and Ctrl-C into Abort
+        interrupted = not isinstance(e.__context__, EOFError)
+    flush()
+    typer.echo(f"\nRecorded {recorded} labels for topic \"{topic}\".")
+    if interrupted:
+        raise typer.Exit(code=130)
+
+
+def _exit_if_missing_api_key(e: ValueError):
+    """Turn the LLM module's missing-API-key error into a CLI error with setup hints."""
+    if "API key not found" in str(e):
+        typer.echo(f"Error: {e}", err=True)
+        typer.echo("\nPlease set your API key as described in the README:\n  export GOOGLE_API_KEY=\"AIz...\"", err=True)
+        raise typer.Exit(code=1)
+
+
+@contextlib.contextmanager
+def _batch_job_errors():
+    """Report batch job failures (and a missing API key) as CLI errors."""
+    import requests
+
+    try:
+        yield
+    except ValueError as e:
+        _exit_if_missing_api_key(e)
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(code=1)
+    except (RuntimeError, requests.RequestException) as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(code=1)
+
+
+def _predict_async_batch(topic: str, payloads: list[str], examples: int, wait: bool = True):
+    """
+    Predict labels for many payloads with one Gemini batch job, one label per line.
+    Lines whose request failed in the batch are printed as empty lines.
+    Without `wait`, the job name is printed instead, for use with --job.
+    """
+    with _batch_job_errors():
+        from ailabel.predictions import label_payloads_batch, submit_labeling_batch
+
+        if not wait:
+            batch_name = submit_labeling_batch(topic, payloads, examples=examples)
+            typer.echo(batch_name)
+            typer.echo(f"Collect the labels later with: label --job {batch_name}", err=True)
+            return
+        labels = label_payloads_batch(topic, payloads, examples=examples)
+    for label in labels:
+        typer.echo(label or "")
+
+
+def _collect_async_batch(batch_name: str):
+    """Wait for a batch job submitted with --no-wait and print its labels, one per line."""
+    with _batch_job_errors():
+        from ailabel.predictions import collect_labeling_batch
+
+        labels = collect_labeling_batch(batch_name)
+    for label in labels:
+        typer.echo(label or "")
+
+
+def _stream_batch(topic: str, label_value: str, examples: int, parallel: int = 1):
+    """
+    Process stdin one line per payload, BATCH_CHUNK_SIZE lines at a time, without
+    reading the whole input first. With a label, each chunk is stored in one
+    transaction; without one, a label is predicted and printed per line, in input
+    order. With `parallel` > 1, up to that many predictions of a chunk run at once
+    and lines whose response couldn't be parsed are printed as empty lines.
+    """
+    payloads = (line.strip() for line in sys.stdin)
+    chunks = batched((p for p in payloads if p), max(BATCH_CHUNK_SIZE, parallel))
+    if label_value:
+        from ailabel.db.crud import create_labeled_payloads_bulk
+
+        recorded = 0
+        for chunk in chunks:
+            recorded += create_labeled_payloads_bulk([(p, label_value, topic) for p in chunk])
+        typer.echo(f'Recorded {recorded} labels as "{label_value}" for topic "{topic}".')
+        return
+
+    try:
+        from ailabel.predictions import label_payload, label_payloads_async
+
+        for chunk in chunks:
+            if parallel > 1:
+                import asyncio
+
+                labels = asyncio.run(
+                    label_payloads_async(topic, list(chunk), examples=examples, max_concurrency=parallel)
+                )
+                typer.echo("\n".join(label or "" for label in labels))
+                continue
+            for p in chunk:
+                typer.echo(label_payload(topic, p, examples=examples))
+    except ValueError as e:
+        _exit_if_missing_api_key(e)
+        raise
+
+
+def _import_jsonl(topic: str):
+    """
+    Store every {"payload": ..., "label": ...} line on stdin in a single transaction.
+    Nothing is stored if any line is malformed.
+    """
+    import json
+
+    from ailabel.db.crud import create_labeled_payloads_bulk
+
+    rows = []
+    for line_number, line in enumerate(sys.stdin, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            rows.append((record["payload"], record["label"], topic))
+        except (json.JSONDecodeError, KeyError, TypeError):
+            typer.echo(f'Error: Line {line_number} is not a JSON object with "payload" and "label"', err=True)
+            raise typer.Exit(code=1)
+    recorded = create_labeled_payloads_bulk(rows) if rows else 0
+    typer.echo(f'Recorded {recorded} labels for topic "{topic}".')
 
 
 # ------------------------------------------------------
@@ -54,6 +232,44 @@ def main(
     payload: Annotated[str, typer.Argument(help="The payload to label. Use '-' to read from stdin.")] = "",
     topic: Annotated[str, typer.Option("--topic", "-t", help="The topic to use for labeling")] = "",
     label_value: Annotated[str, typer.Option("--as", "-a", help="Label to assign to the payload")] = "",
+    interactive: Annotated[
+        bool, typer.Option("--interactive", "-i", help="Label payloads entered at a prompt")
+    ] = False,
+    commit_every: Annotated[
+        int, typer.Option("--commit-every", min=1, help="Records per transaction in --interactive mode")
+    ] = 50,
+    fast_entry: Annotated[
+        bool, typer.Option("--fast-entry", help="In --interactive mode, enter payload<TAB>label on one line")
+    ] = False,
+    batch: Annotated[
+        bool, typer.Option("--batch", "-b", help="Treat each line on stdin as a separate payload")
+    ] = False,
+    parallel: Annotated[
+        int, typer.Option("--parallel", "-p", min=1, help="Concurrent predictions in --batch mode")
+    ] = 1,
+    async_batch: Annotated[
+        bool,
+        typer.Option(
+            "--async-batch",
+            help="Predict a label for every line on stdin using one Gemini batch job (cheaper, slower)",
+        ),
+    ] = False,
+    no_wait: Annotated[
+        bool, typer.Option("--no-wait", help="With --async-batch, print the batch job name and exit")
+    ] = False,
+    job: Annotated[
+        str, typer.Option("--job", help="Print the labels of a batch job submitted with --no-wait")
+    ] = "",
+    jsonl: Annotated[
+        bool,
+        typer.Option("--jsonl", help='Store {"payload": ..., "label": ...} lines from stdin in one transaction'),
+    ] = False,
+    examples: Annotated[
+        int, typer.Option("--examples", min=0, help="Recent labeled payloads to show the model when predicting")
+    ] = 20,
+    verbose: Annotated[
+        bool, typer.Option("--verbose", "-v", help="Log prompts and raw predictions to stderr")
+    ] = False,
 ):
     """
     Label a payload under a given topic.
@@ -62,10 +278,67 @@ def main(
       label label "This product is amazing!" --topic=sentiment --as=positive
       echo "This product is amazing!" | label label - --topic=sentiment --as=positive
       label label --topic=sentiment --interactive
+      cat payloads.txt | label - --topic=sentiment --batch
+      cat payloads.txt | label - --topic=sentiment --batch --parallel 8
+      cat payloads.txt | label - --topic=sentiment --async-batch
+      cat payloads.txt | label - --topic=sentiment --async-batch --no-wait
+      label --job batches/123
+      cat labeled.jsonl | label - --topic=sentiment --jsonl
+      label "I love it" --topic=sentiment --verbose
     """
-    # Check if topic exists
-    if not topic_exists(name=topic):
-        create_topic(name=topic)
+    if verbose:
+        import logging
+
+        logging.basicConfig(format="%(name)s: %(message)s")
+        logging.getLogger("ailabel").setLevel(logging.DEBUG)
+
+    if job:
+        _collect_async_batch(job)
+        return
+    if no_wait and not async_batch:
+        typer.echo("Error: --no-wait only applies to --async-batch", err=True)
+        raise typer.Exit(code=1)
+
+    from ailabel.db.crud import create_labeled_payload, ensure_topic
+
+    # Create the topic if needed; INSERT OR IGNORE avoids a separate existence check
+    if ensure_topic(name=topic):
+        _topic_exists.cache_clear()
+
+    if interactive:
+        if payload or label_value or batch or async_batch or jsonl:
+            typer.echo("Error: --interactive reads payloads and labels from the prompt; omit the payload, --as, --batch, --async-batch and --jsonl", err=True)
+            raise typer.Exit(code=1)
+        _interactive_labeling(topic, commit_every, fast_entry)
+        return
+
+    if jsonl:
+        if payload != "-" or label_value or batch or async_batch:
+            typer.echo("Error: --jsonl reads payloads and labels from stdin; pass '-' and omit --as, --batch and --async-batch", err=True)
+            raise typer.Exit(code=1)
+        _ensure_stdin_passed()
+        _import_jsonl(topic)
+        return
+
+    if async_batch:
+        if payload != "-" or label_value:
+            typer.echo("Error: --async-batch predicts labels for stdin lines; pass '-' and omit --as", err=True)
+            raise typer.Exit(code=1)
+        _ensure_stdin_passed()
+        payloads = [line.strip() for line in sys.stdin if line.strip()]
+        if not payloads:
+            typer.echo("Error: No payloads provided on stdin", err=True)
+            raise typer.Exit(code=1)
+        _predict_async_batch(topic, payloads, examples, wait=not no_wait)
+        return
+
+    if batch:
+        if payload != "-":
+            typer.echo("Error: --batch reads one payload per line from stdin; pass '-'", err=True)
+            raise typer.Exit(code=1)
+        _ensure_stdin_passed()
+        _stream_batch(topic, label_value, examples, parallel)
+        return
 
     # Handle stdin if payload is '-'
     if payload == "-":
@@ -80,13 +353,12 @@ def main(
             raise typer.Exit(code=1)
         case (_, ""):
             try:
-                typer.echo(label_payload(topic, payload))
+                from ailabel.predictions import label_payload
+
+                typer.echo(label_payload(topic, payload, examples=examples))
                 raise typer.Exit(code=0)
             except ValueError as e:
-                if "API key not found" in str(e):
-                    typer.echo(f"Error: {e}", err=True)
-                    typer.echo("\nPlease set your API key as described in the README:\n  export GOOGLE_API_KEY=\"AIz...\"", err=True)
-                    raise typer.Exit(code=1)
+                _exit_if_missing_api_key(e)
                 raise
         case (_, _):
             created = create_labeled_payload(payload=payload, label_name=label_value, topic_name=topic)
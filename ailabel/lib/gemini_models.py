@@ -0,0 +1,19 @@
+"""Gemini model identifiers.
+
+Kept free of any google.generativeai import so that code which only needs to name
+or list models (e.g. debug output) doesn't pay for loading the SDK.
+"""
+
+from enum import Enum
+
+
+class Models(str, Enum):
+    """Available Gemini model versions.
+
+    This enum represents the available Gemini model versions that can be used.
+    The values correspond to the model identifiers used by the Google Generative AI API.
+    """
+
+    GEMINI_2_0 = "models/gemini-2.0"
+    GEMINI_2_0_FLASH = "models/gemini-2.0-flash"
+    GEMINI_2_0_FLASH_8B = "models/gemini-2.0-flash-8b"
@@ -5,8 +5,10 @@ including configuration and specialized functions for generating structured outp
 
 The module:
 1. Configures the Gemini API client using credentials from environment variables
-2. Defines available models as an enumeration
-3. Provides functions for generating JSON responses and other content
+   (or .env / .env.secret, which are only read when this module is first imported
+   and no API key is exported)
+2. Re-exports the available models enumeration from ailabel.lib.gemini_models
+3. Provides sync and async functions for generating JSON responses and other content
 
 Usage:
     # Generate a JSON response
@@ -14,16 +16,48 @@ Usage:
     print(result["temperature"])
 """
 
-import os
-from typing import Dict, Any
+import asyncio
+import copy
+import hashlib
 import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Any
 import functools
-from enum import Enum
-import google.generativeai as genai
-from google.generativeai.types import GenerationConfig, ContentDict
+
+try:
+    # Optional C parser; its JSONDecodeError subclasses json.JSONDecodeError
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+from ailabel.lib.gemini_models import Models
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+    from google.generativeai.types import GenerationConfig, ContentDict
+
+
+def _load_env() -> None:
+    """Load .env and .env.secret into the environment, once per process tree.
+
+    Skipped entirely when an API key is already exported, as in CI.
+    """
+    if os.environ.get("_AILABEL_ENV_LOADED"):
+        return
+    if os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY"):
+        return
+    import dotenv
+
+    dotenv.load_dotenv()
+    dotenv.load_dotenv(".env.secret")
+    os.environ["_AILABEL_ENV_LOADED"] = "1"
 
 
 # Configure the Gemini API client
+_load_env()
 api_key = os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
 if not api_key:
     raise ValueError(
@@ -31,32 +65,64 @@ if not api_key:
         "You can do this by running: export GOOGLE_API_KEY=\"your-api-key\"\n"
         "Or by creating a .env.secret file with GOOGLE_API_KEY=your-api-key"
     )
-genai.configure(api_key=api_key, transport="rest")
 
+# Model used for every request, e.g. AILABEL_GEMINI_MODEL=gemini-2.0-flash-8b
+GEMINI_MODEL = os.environ.get("AILABEL_GEMINI_MODEL", Models.GEMINI_2_0_FLASH.value)
+if not GEMINI_MODEL.startswith("models/"):
+    GEMINI_MODEL = f"models/{GEMINI_MODEL}"
+
+# The whole response for a label prediction, when the label needs no unescaping
+_LABEL_ONLY_RESPONSE = re.compile(r'\s*\{\s*"label"\s*:\s*"([^"\\\x00-\x1f]*)"\s*\}\s*')
+
+# gRPC multiplexes concurrent requests over one HTTP/2 connection. Set
+# AILABEL_GEMINI_TRANSPORT=rest where gRPC traffic is blocked.
+GEMINI_TRANSPORT = os.environ.get("AILABEL_GEMINI_TRANSPORT", "grpc")
 
-class Models(str, Enum):
-    """Available Gemini model versions.
 
-    This enum represents the available Gemini model versions that can be used.
-    The values correspond to the model identifiers used by the Google Generative AI API.
+@functools.cache
+def _genai():
+    """Import and configure google.generativeai on first use.
+
+    The SDK pulls in gRPC and protobuf, so it is only loaded when a model is needed.
     """
+    import google.generativeai as genai
 
-    GEMINI_2_0 = "models/gemini-2.0"
-    GEMINI_2_0_FLASH = "models/gemini-2.0-flash"
-    GEMINI_2_0_FLASH_8B = "models/gemini-2.0-flash-8b"
+    genai.configure(api_key=api_key, transport=GEMINI_TRANSPORT)
+    return genai
 
 
-# Predefined tools and configurations
-JSON_CONFIG: GenerationConfig = genai.GenerationConfig(response_mime_type="application/json", temperature=0.0)
+@functools.cache
+def json_config() -> "GenerationConfig":
+    """Generation config that makes the model answer with deterministic JSON."""
+    return _genai().GenerationConfig(response_mime_type="application/json", temperature=0.0)
 
 
 @functools.cache
-def get_gemini(system_instruction: str | None = None) -> genai.GenerativeModel:
+def request_options() -> Dict[str, Any]:
+    """Request options that retry rate-limited and transiently failing calls.
+
+    Retries back off exponentially from 1s up to 30s between attempts, with
+    jitter, and give up once 120s have passed since the first attempt.
+    """
+    from google.api_core import exceptions, retry
+
+    transient = retry.if_exception_type(
+        exceptions.ResourceExhausted,  # 429
+        exceptions.ServiceUnavailable,  # 503
+        exceptions.DeadlineExceeded,  # 504
+        exceptions.InternalServerError,  # 500
+    )
+    return {"retry": retry.Retry(predicate=transient, initial=1.0, maximum=30.0, multiplier=2.0, timeout=120.0)}
+
+
+@functools.lru_cache(maxsize=64)
+def get_gemini(system_instruction: str | None = None) -> "genai.GenerativeModel":
     """Get a configured Gemini model instance.
 
-    Creates a GenerativeModel instance with the specified system instruction.
-    Results are cached, so calling this function multiple times with the same
-    system_instruction will return the same model instance.
+    Creates a GenerativeModel instance for GEMINI_MODEL with the specified system instruction.
+    Results are cached (up to 64 distinct instructions, least recently used evicted
+    first), so calling this function multiple times with the same system_instruction
+    will return the same model instance. Use `get_gemini.cache_clear()` to reset.
 
     Args:
         system_instruction: Optional system instruction to guide the model's behavior
@@ -64,24 +130,64 @@ def get_gemini(system_instruction: str | None = None) -> genai.GenerativeModel:
     Returns:
         A configured GenerativeModel instance
     """
-    return genai.GenerativeModel(
-        Models.GEMINI_2_0_FLASH,
+    return _genai().GenerativeModel(
+        GEMINI_MODEL,
         system_instruction=system_instruction,
     )
 
 
+# Parsed responses of recent requests. Generation runs at temperature 0, so an
+# identical request gets the same answer without another model call.
+RESPONSE_CACHE_SIZE = 4096
+_response_cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+_response_cache_lock = threading.Lock()  # generate_json_async calls from worker threads
+_response_cache_hits = 0
+_response_cache_misses = 0
+
+
+def _request_key(prompt: str, history: list["ContentDict"] | None, system_instruction: str | None) -> str:
+    """Hash everything that determines the model's answer to a request."""
+    material = json.dumps([system_instruction, history, prompt], default=str)
+    return hashlib.blake2b(material.encode(), digest_size=16).hexdigest()
+
+
+def cache_stats() -> Dict[str, int]:
+    """Get hit/miss counts and the current size of the generate_json response cache."""
+    with _response_cache_lock:
+        return {
+            "hits": _response_cache_hits,
+            "misses": _response_cache_misses,
+            "size": len(_response_cache),
+            "maxsize": RESPONSE_CACHE_SIZE,
+        }
+
+
+def clear_response_cache() -> None:
+    """Empty the generate_json response cache and reset its statistics."""
+    global _response_cache_hits, _response_cache_misses
+    with _response_cache_lock:
+        _response_cache.clear()
+        _response_cache_hits = _response_cache_misses = 0
+
+
 def generate_json(
-    prompt: str, history: list[ContentDict] | None = None, system_instruction: str | None = None
+    prompt: str,
+    history: list["ContentDict"] | None = None,
+    system_instruction: str | None = None,
+    use_cache: bool = True,
 ) -> Dict[str, Any]:
     """Generate a JSON response from the model.
 
     Sends a prompt to the model and returns the parsed JSON response.
     Optionally uses conversation history and system instructions.
+    Responses are cached by request, so repeating a request returns a copy of the
+    earlier response without calling the model.
 
     Args:
         prompt: The prompt to send to the model
         history: Optional conversation history for context
         system_instruction: Optional system instruction to guide the model's behavior
+        use_cache: Whether to read and populate the response cache
 
     Returns:
         The parsed JSON response from the model
@@ -89,11 +195,101 @@ def generate_json(
     Raises:
         ValueError: If the response cannot be parsed as JSON
     """
+    global _response_cache_hits, _response_cache_misses
+    if use_cache:
+        key = _request_key(prompt, history, system_instruction)
+        with _response_cache_lock:
+            cached = _response_cache.get(key)
+            if cached is not None:
+                _response_cache.move_to_end(key)
+                _response_cache_hits += 1
+                return copy.copy(cached)
+            _response_cache_misses += 1
+
+    result = _generate_json_uncached(prompt, history, system_instruction)
+
+    if use_cache:
+        with _response_cache_lock:
+            _response_cache[key] = result
+            if len(_response_cache) > RESPONSE_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+        return copy.copy(result)
+    return result
+
+
+def parse_json_response(text: str) -> Any:
+    """Parse a model's JSON response.
+
+    The common `{"label": "..."}` response is matched directly, skipping the JSON
+    parser. Anything else is parsed in full.
+
+    Raises:
+        ValueError: If the text is not valid JSON
+    """
+    if match := _LABEL_ONLY_RESPONSE.fullmatch(text):
+        return {"label": match.group(1)}
+    return _json_loads(text)
+
+
+def _generate_json_uncached(
+    prompt: str, history: list["ContentDict"] | None, system_instruction: str | None
+) -> Dict[str, Any]:
     model = get_gemini(system_instruction=system_instruction)
-    if history:
-        response = model.generate_content(
-            history + [{"role": "user", "parts": [prompt]}], generation_config=JSON_CONFIG
+    contents = history + [{"role": "user", "parts": [prompt]}] if history else prompt
+    response = model.generate_content(
+        contents, generation_config=json_config(), request_options=request_options()
+    )
+    return parse_json_response(response.text)
+
+
+# Requests currently awaiting a response, so identical concurrent calls share one
+_in_flight: dict[str, asyncio.Future] = {}
+
+
+async def generate_json_async(
+    prompt: str, history: list["ContentDict"] | None = None, system_instruction: str | None = None
+) -> Dict[str, Any]:
+    """Generate a JSON response from the model without blocking the event loop.
+
+    The SDK's async client needs the grpc_asyncio transport, which can't serve the
+    sync calls, so the blocking call runs in a worker thread instead. Many of these
+    can be awaited concurrently to overlap network latency.
+
+    Concurrent calls with the same prompt, history and system instruction are
+    coalesced into one request, and all of them receive the same result object.
+
+    Args:
+        prompt: The prompt to send to the model
+        history: Optional conversation history for context
+        system_instruction: Optional system instruction to guide the model's behavior
+
+    Returns:
+        The parsed JSON response from the model
+
+    Raises:
+        ValueError: If the response cannot be parsed as JSON
+    """
+    key = _request_key(prompt, history, system_instruction)
+    if (pending := _in_flight.get(key)) is not None:
+        # Shield so a cancelled follower doesn't cancel the request for everyone
+        return await asyncio.shield(pending)
+
+    # No await between the lookup above and this insert, so no lock is needed
+    future = _in_flight[key] = asyncio.get_running_loop().create_future()
+    try:
+        result = await asyncio.to_thread(
+            generate_json, prompt, history=history, system_instruction=system_instruction
         )
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark the exception retrieved in case there were no followers to await it
+        future.exception()
+        raise
     else:
-        response = model.generate_content(prompt, generation_config=JSON_CONFIG)
-    return json.loads(response.text)
+        future.set_result(result)
+        return result
+    finally:
+        del _in_flight[key]
@@ -0,0 +1,205 @@
+"""Gemini Batch Mode integration.
+
+This module submits many JSON-generation requests to Gemini as a single batch job,
+which is billed at a discount and is not bound by per-request latency, at the cost
+of completing asynchronously.
+
+The installed google-generativeai SDK does not expose batch jobs, so this module
+talks to the Gemini REST API directly using `requests`.
+
+Usage:
+    results = generate_json_batch(
+        ["I love it", "I hate it"],
+        system_instruction="Label the sentiment as JSON",
+    )
+    print(results[0]["label"])
+
+    # Or submit now and collect the results later, e.g. from another process
+    batch_name = submit_batch(["I love it"], system_instruction="Label the sentiment as JSON")
+    results = poll_batch(batch_name)
+"""
+
+import json
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ailabel.lib.llms import GEMINI_MODEL, api_key, parse_json_response
+
+if TYPE_CHECKING:
+    from google.generativeai.types import ContentDict
+
+API_ROOT = "https://generativelanguage.googleapis.com/v1beta"
+TERMINAL_STATES = {
+    "BATCH_STATE_SUCCEEDED",
+    "BATCH_STATE_FAILED",
+    "BATCH_STATE_CANCELLED",
+    "BATCH_STATE_EXPIRED",
+}
+REQUEST_TIMEOUT = 60.0
+
+# One pooled session so submitting and polling reuse a kept-alive TLS connection.
+# urllib3 only retries idempotent requests (polls), never the job-submitting POST,
+# and honours Retry-After on rate-limited responses.
+_session = requests.Session()
+_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=(429, 500, 502, 503, 504)),
+    ),
+)
+
+
+def _to_rest_content(content: "ContentDict") -> dict:
+    """Convert an SDK-style history entry into the REST `Content` shape."""
+    role = "model" if content["role"] in ("assistant", "model") else "user"
+    return {"role": role, "parts": [{"text": part} for part in content["parts"]]}
+
+
+def _build_batch_requests(
+    prompts: list[str], history: list["ContentDict"] | None, system_instruction: str | None
+) -> list[dict]:
+    """Build one inlined batch request per prompt, keyed by its position."""
+    contents = [_to_rest_content(c) for c in history or []]
+    requests_ = []
+    for i, prompt in enumerate(prompts):
+        request: dict[str, Any] = {
+            "contents": contents + [{"role": "user", "parts": [{"text": prompt}]}],
+            "generation_config": {"response_mime_type": "application/json", "temperature": 0.0},
+        }
+        if system_instruction:
+            request["system_instruction"] = {"parts": [{"text": system_instruction}]}
+        requests_.append({"request": request, "metadata": {"key": f"line_{i}"}})
+    return requests_
+
+
+def _parse_inlined_response(item: dict) -> Dict[str, Any] | None:
+    """Parse one batch item's JSON output, or None if it errored, was blocked, or isn't JSON."""
+    try:
+        text = item["response"]["candidates"][0]["content"]["parts"][0]["text"]
+        result = parse_json_response(text)
+    except (KeyError, IndexError, json.JSONDecodeError):
+        return None
+    return result if isinstance(result, dict) else None
+
+
+def _headers() -> dict:
+    return {"x-goog-api-key": api_key, "Content-Type": "application/json"}
+
+
+def submit_batch(
+    prompts: list[str],
+    history: list["ContentDict"] | None = None,
+    system_instruction: str | None = None,
+) -> str:
+    """Submit a Gemini batch job with one JSON-generation request per prompt.
+
+    Every prompt shares the same history and system instruction.
+
+    Args:
+        prompts: The prompts to send to the model
+        history: Optional conversation history prepended to every prompt
+        system_instruction: Optional system instruction to guide the model's behavior
+
+    Returns:
+        The batch job name (e.g. "batches/123"), to be passed to `poll_batch`
+
+    Raises:
+        requests.RequestException: If the Gemini API cannot be reached or rejects the job
+    """
+    body = {
+        "batch": {
+            "display_name": "ailabel-batch",
+            "input_config": {
+                "requests": {"requests": _build_batch_requests(prompts, history, system_instruction)}
+            },
+        }
+    }
+    response = _session.post(
+        f"{API_ROOT}/{GEMINI_MODEL}:batchGenerateContent",
+        headers=_headers(),
+        json=body,
+        timeout=REQUEST_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()["name"]
+
+
+def poll_batch(
+    batch_name: str, poll_interval: float = 10.0, max_wait: float = 24 * 60 * 60
+) -> list[Dict[str, Any] | None]:
+    """Wait for a batch job submitted with `submit_batch` and return its results.
+
+    Args:
+        batch_name: The job name returned by `submit_batch`
+        poll_interval: Seconds to wait between job status checks
+        max_wait: Seconds to wait for the job to finish before giving up
+
+    Returns:
+        The parsed JSON responses in the same order as the submitted prompts. Entries
+        whose individual request failed or did not return a JSON object are None.
+
+    Raises:
+        RuntimeError: If the batch job does not succeed or exceeds `max_wait`
+        requests.RequestException: If the Gemini API cannot be reached or rejects a call
+    """
+    deadline = time.monotonic() + max_wait
+    while True:
+        status = _session.get(f"{API_ROOT}/{batch_name}", headers=_headers(), timeout=REQUEST_TIMEOUT)
+        status.raise_for_status()
+        job = status.json()
+        state = job.get("metadata", {}).get("state")
+        if state in TERMINAL_STATES:
+            break
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"Batch job {batch_name} did not finish within {max_wait:g}s")
+        time.sleep(poll_interval)
+
+    if state != "BATCH_STATE_SUCCEEDED":
+        raise RuntimeError(f"Batch job {batch_name} finished with state {state}")
+
+    items = job["response"]["inlinedResponses"]["inlinedResponses"]
+    results: list[Dict[str, Any] | None] = [None] * len(items)
+    for item in items:
+        index = int(item["metadata"]["key"].removeprefix("line_"))
+        results[index] = _parse_inlined_response(item)
+    return results
+
+
+def generate_json_batch(
+    prompts: list[str],
+    history: list["ContentDict"] | None = None,
+    system_instruction: str | None = None,
+    poll_interval: float = 10.0,
+    max_wait: float = 24 * 60 * 60,
+) -> list[Dict[str, Any] | None]:
+    """Generate JSON responses for many prompts with a single Gemini batch job.
+
+    Submits the job with `submit_batch` and blocks in `poll_batch` until it finishes.
+    The job name is printed to stderr once submitted so an interrupted run can be
+    resumed with `poll_batch`.
+
+    Args:
+        prompts: The prompts to send to the model
+        history: Optional conversation history prepended to every prompt
+        system_instruction: Optional system instruction to guide the model's behavior
+        poll_interval: Seconds to wait between job status checks
+        max_wait: Seconds to wait for the job to finish before giving up
+
+    Returns:
+        The parsed JSON responses in the same order as `prompts`. Entries whose
+        individual request failed or did not return a JSON object are None.
+
+    Raises:
+        RuntimeError: If the batch job does not succeed or exceeds `max_wait`
+        requests.RequestException: If the Gemini API cannot be reached or rejects a call
+    """
+    batch_name = submit_batch(prompts, history=history, system_instruction=system_instruction)
+    print(f"Submitted Gemini batch job {batch_name}", file=sys.stderr)
+    return poll_batch(batch_name, poll_interval=poll_interval, max_wait=max_wait)
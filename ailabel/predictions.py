@@ -1,48 +1,222 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import textwrap
+import time
+from collections import OrderedDict
+from itertools import chain, zip_longest
+
 from ailabel.db.crud import (
     get_label_statistics,
-    get_recent_labeled_payloads,
+    get_recent_examples,
+    labeled_payloads_version,
 )
 
-from ailabel.lib.llms import generate_json
+from ailabel.lib.llms import generate_json, generate_json_async
+
+logger = logging.getLogger(__name__)
+
+# Number of recent labeled payloads sent to the model as few-shot examples
+DEFAULT_EXAMPLES = 20
+# Few-shot examples are picked round-robin across labels from this many times
+# `examples` recent payloads, at most MAX_EXAMPLES_PER_LABEL per label, and each is
+# cut to MAX_CHARS_PER_EXAMPLE characters. Every example token is paid for on each request.
+EXAMPLE_POOL_FACTOR = 4
+MAX_EXAMPLES_PER_LABEL = int(os.environ.get("AILABEL_MAX_EXAMPLES_PER_LABEL", "5"))
+MAX_CHARS_PER_EXAMPLE = int(os.environ.get("AILABEL_MAX_CHARS_PER_EXAMPLE", "512"))
+# Concurrent Gemini requests allowed by label_payloads_async
+DEFAULT_MAX_CONCURRENCY = 8
+# Seconds a topic's context is reused. Writes from this process invalidate it at
+# once; the TTL bounds how long labels written by other processes go unseen.
+CLASSIFIER_TTL = 60.0
+CLASSIFIER_CACHE_SIZE = 64
+
+
+@functools.lru_cache(maxsize=16)
+def _render_system_instruction(topic: str, distinct_labels: tuple[str, ...]) -> str:
+    """Render the classification system instruction once per (topic, labels)."""
+    quoted_labels = [json.dumps(label) for label in distinct_labels]
+    labels_text = ", ".join(quoted_labels)
+    examples = "\n".join(f'            {{ "label": {label} }}' for label in quoted_labels[:2])
+    return f"""Your task is to label incoming payloads for topic "{topic}".
+            It is a classification task with the following possible labels: {labels_text}.
+            Your response should have the format:
+            {{ "label": "your-label-here" }}
+            Where "your-label-here" is one of the possible labels for this topic.
+            Example:
+{examples}"""
+
+
+def _select_examples(recent: list[tuple[str, str]], examples: int) -> list[tuple[str, str]]:
+    """Pick up to `examples` (payload, label) pairs, alternating between labels.
+
+    Taking the newest example of each label in turn keeps rare labels represented
+    when one label dominates the recent payloads.
+    """
+    by_label: dict[str, list[tuple[str, str]]] = {}
+    for example in recent:
+        by_label.setdefault(example[1], []).append(example)
+    rounds = zip_longest(*(group[:MAX_EXAMPLES_PER_LABEL] for group in by_label.values()))
+    return [example for example in chain.from_iterable(rounds) if example is not None][:examples]
+
+
+def _truncate(payload: str) -> str:
+    """Shorten a long example payload to MAX_CHARS_PER_EXAMPLE characters."""
+    if len(payload) <= MAX_CHARS_PER_EXAMPLE:
+        return payload
+    return textwrap.shorten(payload, width=MAX_CHARS_PER_EXAMPLE, placeholder=" ...")
 
 
-def label_payload(topic: str, payload: str):
-    """Predict a label for a given payload in a topic."""
+class TopicClassifier:
+    """Predicts labels for payloads in one topic.
 
-    def get_examples_for_topic(topic: str):
-        topic_actual_labels = get_recent_labeled_payloads(topic)
-        history = []
-        for label in topic_actual_labels:
-            history += [
-                {"role": "user", "parts": [label.payload]},
-                {"role": "assistant", "parts": [f'{{ "label": "{label.label_name}" }}']},
-            ]
-        return history
+    The system instruction and few-shot history are built once, when the classifier
+    is created, and shared by every prediction. At most `examples` recent labeled
+    payloads are sent, spread across labels and truncated, since every example adds
+    prompt tokens that the model must process before answering. Use `get_classifier`
+    to reuse classifiers.
 
-    def predict_label_for_payload(topic: str, payload: str):
-        labels_for_topic = get_label_statistics(topic)
-        distinct_labels = list(labels_for_topic.keys())
-        if not distinct_labels:
+    Raises:
+        ValueError: If the topic has no labeled payloads
+    """
+
+    def __init__(self, topic: str, examples: int = DEFAULT_EXAMPLES):
+        self.topic = topic
+        self.examples = examples
+        self.version = labeled_payloads_version()
+        self.built_at = time.monotonic()
+        self.labels = tuple(get_label_statistics(topic).keys())
+        if not self.labels:
             raise ValueError(f"Topic '{topic}' has no labels. Please label some payloads first.")
+        self.system_instruction = _render_system_instruction(topic, self.labels)
+        recent = get_recent_examples(topic, limit=examples * EXAMPLE_POOL_FACTOR)
+        self.history = [
+            message
+            for example_payload, example_label in _select_examples(recent, examples)
+            for message in (
+                {"role": "user", "parts": [_truncate(example_payload)]},
+                {"role": "assistant", "parts": [json.dumps({"label": example_label})]},
+            )
+        ]
 
-        # For multi-line input in batch mode, we need to adjust the system prompt
-        history = get_examples_for_topic(topic)
-        system_instruction = f"""Your task is to label incoming payloads for topic "{topic}".
-                It is a classification task with the following possible labels: {distinct_labels}.
-                Your response should have the format:
-                {{ "label": "your-label-here" }}
-                Where "your-label-here" is one of the possible labels for this topic.
-                Example:
-                {{ "label": "{distinct_labels[0]}" }}
-                {{ "label": "{distinct_labels[1]}" }}"""
+    def is_stale(self) -> bool:
+        """Whether labels were written since this classifier was built, or its TTL passed."""
+        return (
+            self.version != labeled_payloads_version()
+            or time.monotonic() - self.built_at > CLASSIFIER_TTL
+        )
 
+    def predict(self, payload: str) -> str:
+        """Predict a label for a payload."""
         predicted_label = generate_json(
-            payload,
-            history=history,
-            system_instruction=system_instruction,
+            payload, history=self.history, system_instruction=self.system_instruction
         )
-        print(system_instruction)
-        print(f"Predicted label: {predicted_label}")
+        logger.debug("System instruction: %s", self.system_instruction)
+        logger.debug("Predicted label: %s", predicted_label)
         return predicted_label["label"]
 
-    return predict_label_for_payload(topic, payload)
+    async def predict_async(self, payload: str) -> str | None:
+        """Predict a label for a payload without blocking the event loop.
+
+        Returns None if the response isn't a JSON object.
+        """
+        try:
+            result = await generate_json_async(
+                payload, history=self.history, system_instruction=self.system_instruction
+            )
+        except ValueError:
+            return None
+        return result.get("label") if isinstance(result, dict) else None
+
+
+_classifiers: OrderedDict[tuple[str, int], TopicClassifier] = OrderedDict()
+
+
+def get_classifier(topic: str, examples: int = DEFAULT_EXAMPLES) -> TopicClassifier:
+    """Get a classifier for a topic, reusing a cached one unless it is stale.
+
+    Raises:
+        ValueError: If the topic has no labeled payloads. This result is not cached.
+    """
+    key = (topic, examples)
+    classifier = _classifiers.get(key)
+    if classifier is None or classifier.is_stale():
+        classifier = _classifiers[key] = TopicClassifier(topic, examples)
+        if len(_classifiers) > CLASSIFIER_CACHE_SIZE:
+            _classifiers.popitem(last=False)
+    _classifiers.move_to_end(key)
+    return classifier
+
+
+def clear_classifiers() -> None:
+    """Forget all cached classifiers."""
+    _classifiers.clear()
+
+
+def label_payload(topic: str, payload: str, examples: int = DEFAULT_EXAMPLES):
+    """Predict a label for a given payload in a topic, using up to `examples` few-shot examples."""
+    return get_classifier(topic, examples).predict(payload)
+
+
+async def label_payloads_async(
+    topic: str,
+    payloads: list[str],
+    examples: int = DEFAULT_EXAMPLES,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> list[str | None]:
+    """Predict labels for many payloads in a topic with concurrent Gemini requests.
+
+    One classifier is shared by every request. At most `max_concurrency` requests
+    are in flight at a time, to stay within rate limits. Payloads whose response
+    isn't valid JSON map to None.
+    """
+    classifier = get_classifier(topic, examples)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def predict(payload: str) -> str | None:
+        async with semaphore:
+            return await classifier.predict_async(payload)
+
+    return list(await asyncio.gather(*(predict(p) for p in payloads)))
+
+
+def label_payloads_batch(
+    topic: str, payloads: list[str], examples: int = DEFAULT_EXAMPLES
+) -> list[str | None]:
+    """Predict labels for many payloads in a topic with a single Gemini batch job.
+
+    Blocks until the batch job completes. Payloads whose request failed map to None.
+    """
+    from ailabel.lib.llms_batch import generate_json_batch
+
+    classifier = get_classifier(topic, examples)
+    results = generate_json_batch(
+        payloads, history=classifier.history, system_instruction=classifier.system_instruction
+    )
+    return [result.get("label") if result else None for result in results]
+
+
+def submit_labeling_batch(topic: str, payloads: list[str], examples: int = DEFAULT_EXAMPLES) -> str:
+    """Submit a Gemini batch job predicting labels for payloads in a topic, without waiting.
+
+    Returns:
+        The batch job name, to be passed to `collect_labeling_batch`
+    """
+    from ailabel.lib.llms_batch import submit_batch
+
+    classifier = get_classifier(topic, examples)
+    return submit_batch(
+        payloads, history=classifier.history, system_instruction=classifier.system_instruction
+    )
+
+
+def collect_labeling_batch(batch_name: str) -> list[str | None]:
+    """Wait for a job from `submit_labeling_batch` and return its labels in payload order.
+
+    Payloads whose request failed map to None.
+    """
+    from ailabel.lib.llms_batch import poll_batch
+
+    return [result.get("label") if result else None for result in poll_batch(batch_name)]
@@ -1,23 +1,65 @@
 import os
 import pytest
 from pathlib import Path
+from sqlalchemy import event
 from sqlmodel import Session, SQLModel, create_engine
 from sqlmodel.pool import StaticPool
 
+from ailabel.db.database import set_sqlite_pragmas
 from ailabel.db.models import Topic, Label, LabeledPayload
 
+# ailabel.lib.llms checks for an API key at import time, which happens during collection
+os.environ.setdefault("GEMINI_API_KEY", "fake-api-key")
 
-@pytest.fixture(name="session")
-def session_fixture():
-    """Create an in-memory database session for testing."""
+
+@pytest.fixture(scope="session")
+def engine():
+    """Create the in-memory test database and its schema once per test run.
+
+    Shared by every test that needs an engine; use the `session` fixture to have
+    a test's writes rolled back.
+    """
     engine = create_engine(
         "sqlite:///:memory:",
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
+        # A single connection that each test rolls back itself: no liveness check,
+        # no reset on checkin, no SQL logging
+        pool_pre_ping=False,
+        pool_reset_on_return=None,
+        echo=False,
     )
+    # Configured like the real database; WAL doesn't apply to :memory:
+    event.listen(engine, "connect", set_sqlite_pragmas)
+
+    # pysqlite manages transactions itself and breaks SAVEPOINT; let SQLAlchemy do it
+    @event.listens_for(engine, "connect")
+    def disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def emit_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
     SQLModel.metadata.create_all(engine)
-    with Session(engine) as session:
-        yield session
+    return engine
+
+
+@pytest.fixture(name="session")
+def session_fixture(engine):
+    """Create a database session whose changes are rolled back after the test.
+
+    Commits inside the test only release a savepoint, so the outer transaction
+    can undo everything the test wrote. Objects aren't expired on commit, so
+    reading their attributes afterwards doesn't query the database again.
+    """
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        with Session(
+            bind=connection, join_transaction_mode="create_savepoint", expire_on_commit=False
+        ) as session:
+            yield session
+        transaction.rollback()
 
 
 @pytest.fixture(name="mock_gemini_api_key", autouse=True)
@@ -1,18 +1,23 @@
 import pytest
+from sqlalchemy.exc import InvalidRequestError
 from sqlmodel import Session, select
-from datetime import datetime
 
 from ailabel.db.models import Topic, Label, LabeledPayload
 from ailabel.db.crud import (
     create_topic,
+    ensure_topic,
     create_label,
     create_labeled_payload,
+    create_labeled_payloads_bulk,
     get_all_topics,
+    count_topics,
     get_topic,
     get_labels_for_topic,
     get_label_statistics,
     topic_exists,
-    get_recent_labeled_payloads
+    get_recent_labeled_payloads,
+    get_recent_examples,
+    labeled_payloads_version,
 )
 
 
@@ -67,8 +72,8 @@ def test_create_labeled_payload(session: Session, sample_topic, sample_label, sa
     assert payload.payload == sample_payload
     assert payload.label_name == sample_label
     assert payload.topic_name == sample_topic
-    assert isinstance(payload.id, str)
-    assert isinstance(payload.created_at, datetime)
+    assert isinstance(payload.id, int)
+    assert isinstance(payload.created_at, int)
     
     # Verify we can retrieve it from the database
     db_payload = session.exec(
@@ -78,6 +83,7 @@ def test_create_labeled_payload(session: Session, sample_topic, sample_label, sa
     assert db_payload.payload == sample_payload
     assert db_payload.label_name == sample_label
     assert db_payload.topic_name == sample_topic
+    assert db_payload.id == payload.id
 
 
 def test_get_all_topics(session: Session):
@@ -96,6 +102,16 @@ def test_get_all_topics(session: Session):
     assert topic_names == {"topic1", "topic2", "topic3"}
 
 
+def test_count_topics(session: Session):
+    """Test counting topics."""
+    assert count_topics(session=session) == 0
+
+    create_topic(name="topic1", session=session)
+    create_topic(name="topic2", session=session)
+
+    assert count_topics(session=session) == 2
+
+
 def test_get_topic(session: Session, sample_topic):
     """Test getting a specific topic."""
     # Create a topic
@@ -195,8 +211,8 @@ def test_get_recent_labeled_payloads(session: Session, sample_topic):
     # Create labels
     create_label(name="label1", topic_name=sample_topic, session=session)
     
-    # Create 15 labeled payloads
-    for i in range(15):
+    # Create 25 labeled payloads
+    for i in range(25):
         create_labeled_payload(
             payload=f"Payload {i}",
             label_name="label1",
@@ -206,14 +222,84 @@ def test_get_recent_labeled_payloads(session: Session, sample_topic):
     
     # Get recent payloads with default limit
     payloads = get_recent_labeled_payloads(topic_name=sample_topic, session=session)
-    assert len(payloads) == 10  # Default limit is 10
+    assert len(payloads) == 20  # Default limit is 20
     
     # Verify payloads are in reverse chronological order (newest first)
-    assert payloads[0].payload == "Payload 14"
-    assert payloads[9].payload == "Payload 5"
+    assert payloads[0].payload == "Payload 24"
+    assert payloads[19].payload == "Payload 5"
     
     # Test with custom limit
     payloads = get_recent_labeled_payloads(topic_name=sample_topic, limit=5, session=session)
     assert len(payloads) == 5
-    assert payloads[0].payload == "Payload 14"
-    assert payloads[4].payload == "Payload 10"
\ No newline at end of file
+    assert payloads[0].payload == "Payload 24"
+    assert payloads[4].payload == "Payload 20"
+
+    # Parents are eager-loaded; anything else must not lazy-load per row
+    assert payloads[0].label.name == "label1"
+    assert payloads[0].topic.name == sample_topic
+    with pytest.raises(InvalidRequestError):
+        payloads[0].label.examples
+
+
+def test_create_labeled_payloads_bulk(session: Session, sample_topic):
+    """Test storing many labeled payloads at once."""
+    create_topic(name=sample_topic, session=session)
+    create_label(name="label1", topic_name=sample_topic, session=session)
+
+    rows = [(f"Payload {i}", "label1", sample_topic) for i in range(5)]
+    assert create_labeled_payloads_bulk(rows, session=session) == 5
+
+    stats = get_label_statistics(topic_name=sample_topic, session=session)
+    assert stats == {"label1": 5}
+
+
+def test_create_labeled_payloads_bulk_in_chunks(session: Session, sample_topic, monkeypatch):
+    """Test that bulk inserts spanning several chunks store every row."""
+    monkeypatch.setattr("ailabel.db.crud.BULK_INSERT_CHUNK_SIZE", 2)
+    create_topic(name=sample_topic, session=session)
+    create_label(name="label1", topic_name=sample_topic, session=session)
+
+    rows = [(f"Payload {i}", "label1", sample_topic) for i in range(5)]
+    assert create_labeled_payloads_bulk(rows, session=session) == 5
+
+    payloads = get_recent_labeled_payloads(topic_name=sample_topic, session=session)
+    assert {p.payload for p in payloads} == {f"Payload {i}" for i in range(5)}
+    assert len({p.id for p in payloads}) == 5
+
+
+def test_labeled_payloads_version(session: Session, sample_topic):
+    """Test that storing labeled payloads bumps the write version."""
+    create_topic(name=sample_topic, session=session)
+    create_label(name="label1", topic_name=sample_topic, session=session)
+
+    before = labeled_payloads_version()
+    create_labeled_payload(
+        payload="Payload", label_name="label1", topic_name=sample_topic, session=session
+    )
+    create_labeled_payloads_bulk([("Payload 2", "label1", sample_topic)], session=session)
+
+    assert labeled_payloads_version() == before + 2
+
+
+def test_ensure_topic(session: Session, sample_topic):
+    """Test creating a topic idempotently."""
+    assert ensure_topic(name=sample_topic, session=session) is True
+    assert ensure_topic(name=sample_topic, session=session) is False
+
+    assert topic_exists(name=sample_topic, session=session) is True
+    assert count_topics(session=session) == 1
+
+
+def test_get_recent_examples(session: Session, sample_topic):
+    """Test getting recent (payload, label) pairs."""
+    create_topic(name=sample_topic, session=session)
+    create_label(name="label1", topic_name=sample_topic, session=session)
+    create_labeled_payloads_bulk(
+        [(f"Payload {i}", "label1", sample_topic) for i in range(3)], session=session
+    )
+    create_labeled_payload(payload="Newest", label_name="label1", topic_name=sample_topic, session=session)
+
+    examples = get_recent_examples(topic_name=sample_topic, limit=2, session=session)
+
+    assert examples[0] == ("Newest", "label1")
+    assert len(examples) == 2
@@ -1,20 +1,19 @@
 import pytest
+from sqlalchemy import event
 from sqlmodel import Session, SQLModel, create_engine
-from sqlmodel.pool import StaticPool
 
-from ailabel.db.database import with_session
+from ailabel.db.database import (
+    init_schema,
+    migrate_created_at_to_epoch,
+    migrate_labeled_payload_ids,
+    session_scope,
+    set_sqlite_pragmas,
+    with_session,
+)
 
 
-def test_with_session_decorator():
+def test_with_session_decorator(engine):
     """Test the with_session decorator behavior."""
-    # Create an in-memory test database
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    SQLModel.metadata.create_all(engine)
-    
     # Test function to be decorated
     @with_session
     def test_function(session: Session, value: str):
@@ -31,16 +30,8 @@ def test_with_session_decorator():
         assert result == "Got session and value: explicit"
 
 
-def test_with_session_error_handling():
+def test_with_session_error_handling(engine):
     """Test error handling in the with_session decorator."""
-    # Create an in-memory test database
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    SQLModel.metadata.create_all(engine)
-    
     # Test function that raises an exception
     @with_session
     def failing_function(session: Session):
@@ -53,4 +44,105 @@ def test_with_session_error_handling():
     # With explicit session
     with pytest.raises(ValueError, match="Test exception"):
         with Session(engine) as session:
-            failing_function(session=session)
\ No newline at end of file
+            failing_function(session=session)
+
+
+def test_set_sqlite_pragmas(tmp_path):
+    """Test that new connections are configured for WAL with relaxed syncing."""
+    engine = create_engine(f"sqlite:///{tmp_path}/labels.db")
+    event.listen(engine, "connect", set_sqlite_pragmas)
+
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        # 1 == NORMAL
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+        # Negative sizes are in KiB
+        assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == -65536
+
+
+def test_session_scope_shares_session():
+    """Test that decorated calls inside session_scope reuse one session."""
+    @with_session
+    def current_session(session: Session):
+        return session
+
+    with session_scope() as scoped:
+        assert current_session() is scoped
+        with session_scope() as nested:
+            assert nested is scoped
+            assert current_session() is scoped
+
+    assert current_session() is not scoped
+
+
+def test_migrate_labeled_payload_ids(tmp_path):
+    """Test that a database with TEXT UUID payload ids is rebuilt with integer ids."""
+    engine = create_engine(f"sqlite:///{tmp_path}/labels.db")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE labeledpayload (id VARCHAR NOT NULL PRIMARY KEY, payload VARCHAR NOT NULL,"
+            " label_name VARCHAR NOT NULL, topic_name VARCHAR NOT NULL, created_at DATETIME NOT NULL)"
+        )
+        connection.exec_driver_sql("CREATE INDEX ix_lp_topic_label ON labeledpayload (topic_name, label_name)")
+        connection.exec_driver_sql(
+            "INSERT INTO labeledpayload VALUES"
+            " ('b-uuid', 'second', 'neg', 'sentiment', '2025-01-02 00:00:00'),"
+            " ('a-uuid', 'first', 'pos', 'sentiment', '2025-01-01 00:00:00')"
+        )
+
+    migrate_labeled_payload_ids(engine)
+    SQLModel.metadata.create_all(engine)
+
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT id, payload, label_name FROM labeledpayload ORDER BY id"
+        ).all()
+    assert rows == [(1, "first", "pos"), (2, "second", "neg")]
+
+    # Already migrated databases are left alone
+    migrate_labeled_payload_ids(engine)
+
+
+def test_init_schema_runs_once(tmp_path):
+    """Test that the schema is only created when the marker is missing."""
+    db_file = tmp_path / "labels.db"
+    marker = tmp_path / ".schema_v2"
+    engine = create_engine(f"sqlite:///{db_file}")
+    with engine.begin() as connection:
+        # A table from before the indexes were added
+        connection.exec_driver_sql("CREATE TABLE label (name VARCHAR NOT NULL PRIMARY KEY, topic_name VARCHAR NOT NULL)")
+
+    init_schema(engine, marker, db_file)
+
+    assert marker.exists()
+    with engine.connect() as connection:
+        indexes = {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"ix_label_topic", "ix_lp_topic_label", "ix_lp_topic_created_at"} <= indexes
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    init_schema(engine, marker, db_file)
+    assert statements == []
+
+
+def test_migrate_created_at_to_epoch(tmp_path):
+    """Test that text timestamps become integer microseconds since the epoch."""
+    engine = create_engine(f"sqlite:///{tmp_path}/labels.db")
+    migrate_created_at_to_epoch(engine)  # No table yet
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE labeledpayload (id INTEGER NOT NULL PRIMARY KEY, payload VARCHAR NOT NULL,"
+            " label_name VARCHAR NOT NULL, topic_name VARCHAR NOT NULL, created_at DATETIME NOT NULL)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO labeledpayload VALUES"
+            " (1, 'old', 'pos', 'sentiment', '2025-01-01 00:00:00.500000'),"
+            " (2, 'new', 'pos', 'sentiment', 1735689601000000)"
+        )
+
+    migrate_created_at_to_epoch(engine)
+
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql("SELECT created_at FROM labeledpayload ORDER BY id").scalars().all()
+    assert rows == [1735689600500000, 1735689601000000]
@@ -1,112 +1,87 @@
 import pytest
 from sqlmodel import Session
-from datetime import datetime
 
 from ailabel.db.models import Topic, Label, LabeledPayload
 
 
-def test_topic_model(session: Session):
-    """Test creating and retrieving a Topic."""
-    # Create a topic
-    topic_name = "test_topic"
-    topic = Topic(name=topic_name)
+@pytest.fixture
+def topic(session: Session, sample_topic):
+    """A flushed Topic named `sample_topic`."""
+    topic = Topic(name=sample_topic)
     session.add(topic)
-    session.commit()
-    
-    # Retrieve the topic
-    session.refresh(topic)
-    assert topic.name == topic_name
+    session.flush()
+    return topic
+
+
+@pytest.fixture
+def label(session: Session, topic, sample_label):
+    """A flushed Label named `sample_label` in `topic`."""
+    label = Label(name=sample_label, topic_name=topic.name)
+    session.add(label)
+    session.flush()
+    return label
+
+
+def test_topic_model(topic, sample_topic):
+    """Test creating and retrieving a Topic."""
+    # Nothing server-generated to read back; the collections load lazily
+    assert topic.name == sample_topic
     assert isinstance(topic.labels, list)
     assert isinstance(topic.examples, list)
     assert len(topic.labels) == 0
     assert len(topic.examples) == 0
 
 
-def test_label_model(session: Session):
+def test_label_model(label, sample_topic, sample_label):
     """Test creating and retrieving a Label with Topic relationship."""
-    # Create a topic first
-    topic_name = "test_topic"
-    topic = Topic(name=topic_name)
-    session.add(topic)
-    session.commit()
-    
-    # Create a label for the topic
-    label_name = "test_label"
-    label = Label(name=label_name, topic_name=topic_name)
-    session.add(label)
-    session.commit()
-    
-    # Retrieve the label
-    session.refresh(label)
-    assert label.name == label_name
-    assert label.topic_name == topic_name
-    assert label.topic.name == topic_name
+    # label.topic is loaded from the identity map, no refresh needed
+    assert label.name == sample_label
+    assert label.topic_name == sample_topic
+    assert label.topic.name == sample_topic
     assert isinstance(label.examples, list)
     assert len(label.examples) == 0
 
 
-def test_labeled_payload_model(session: Session):
+def test_labeled_payload_model(session: Session, label):
     """Test creating and retrieving a LabeledPayload with relationships."""
-    # Create a topic
-    topic_name = "test_topic"
-    topic = Topic(name=topic_name)
-    session.add(topic)
-    
-    # Create a label
-    label_name = "test_label"
-    label = Label(name=label_name, topic_name=topic_name)
-    session.add(label)
-    session.commit()
-    
     # Create a labeled payload
     payload_text = "This is a test payload"
     labeled_payload = LabeledPayload(
         payload=payload_text,
-        label_name=label_name,
-        topic_name=topic_name
+        label_name=label.name,
+        topic_name=label.topic_name
     )
     session.add(labeled_payload)
-    session.commit()
+    session.flush()
     
     # Retrieve the labeled payload
     session.refresh(labeled_payload)
     assert labeled_payload.payload == payload_text
-    assert labeled_payload.label_name == label_name
-    assert labeled_payload.topic_name == topic_name
-    assert labeled_payload.label.name == label_name
-    assert labeled_payload.topic.name == topic_name
-    assert isinstance(labeled_payload.id, str)
-    assert isinstance(labeled_payload.created_at, datetime)
+    assert labeled_payload.label_name == label.name
+    assert labeled_payload.topic_name == label.topic_name
+    assert labeled_payload.label.name == label.name
+    assert labeled_payload.topic.name == label.topic_name
+    assert isinstance(labeled_payload.id, int)
+    assert isinstance(labeled_payload.created_at, int)
 
 
-def test_relationships(session: Session):
+def test_relationships(session: Session, topic):
     """Test the relationships between models."""
-    # Create a topic
-    topic_name = "test_topic"
-    topic = Topic(name=topic_name)
-    session.add(topic)
-    
-    # Create multiple labels for the topic
+    # Give the topic multiple labels
+    topic_name = topic.name
     label1 = Label(name="label1", topic_name=topic_name)
     label2 = Label(name="label2", topic_name=topic_name)
-    session.add(label1)
-    session.add(label2)
-    session.commit()
+    session.add_all([label1, label2])
+    session.flush()
     
     # Create labeled payloads
     payload1 = LabeledPayload(payload="payload1", label_name="label1", topic_name=topic_name)
     payload2 = LabeledPayload(payload="payload2", label_name="label1", topic_name=topic_name)
     payload3 = LabeledPayload(payload="payload3", label_name="label2", topic_name=topic_name)
-    session.add(payload1)
-    session.add(payload2)
-    session.add(payload3)
-    session.commit()
-    
-    # Test relationships
-    session.refresh(topic)
-    session.refresh(label1)
-    session.refresh(label2)
+    session.add_all([payload1, payload2, payload3])
+    session.flush()
     
+    # The collections were never accessed, so they load lazily from the flushed rows
     # Topic should have two labels
     assert len(topic.labels) == 2
     assert {label.name for label in topic.labels} == {"label1", "label2"}
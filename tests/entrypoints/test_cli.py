@@ -1,84 +1,426 @@
 import pytest
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 from typer.testing import CliRunner
-from typer import Exit
+from typer import Abort
 
+from ailabel.entrypoints import cli
 from ailabel.entrypoints.cli import app
-from ailabel.db.models import Topic, LabeledPayload
 
 
 runner = CliRunner()
 
+# Canned return values shared by the tests; the CLI only reads them
+_FAKE_STATS = {"positive": 5, "negative": 3}
+_FAKE_PAYLOAD = SimpleNamespace(id="test-id")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def warm_up_app():
+    """Invoke the app once so one-time imports aren't timed as part of the first test."""
+    runner.invoke(app, ["--help"])
+
+
+@pytest.fixture(autouse=True)
+def clear_topic_exists_cache():
+    """Reset the memoized topic lookup so each test sees its own mocks."""
+    cli._topic_exists.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def mock_topic_exists():
+    """Report every topic as existing without touching the user's database."""
+    with patch("ailabel.db.crud.topic_exists", return_value=True) as mock:
+        yield mock
+
+
+@pytest.fixture(autouse=True)
+def mock_ensure_topic():
+    """Keep CLI tests from creating topics in the user's database."""
+    with patch("ailabel.db.crud.ensure_topic", return_value=False) as mock:
+        yield mock
+
+
+@pytest.fixture
+def cli_mocks(monkeypatch, mock_topic_exists):
+    """Stub the topic lookup, label storage and prediction behind the CLI."""
+    mocks = SimpleNamespace(
+        exists=mock_topic_exists,
+        create=MagicMock(return_value=_FAKE_PAYLOAD),
+        predict=MagicMock(return_value="predicted_label"),
+    )
+    monkeypatch.setattr("ailabel.db.crud.create_labeled_payload", mocks.create)
+    monkeypatch.setattr("ailabel.predictions.label_payload", mocks.predict)
+    return mocks
+
 
 def test_main_no_args():
     """Test the main command with no arguments."""
-    result = runner.invoke(app)
+    result = runner.invoke(app, catch_exceptions=False)
     assert "Usage" in result.stdout
     assert result.exit_code == 0
 
 
-def test_display_topic_details():
+def test_display_topic_details(monkeypatch):
     """Test displaying topic details."""
-    with patch("ailabel.entrypoints.cli._display_topic_details") as mock_display:
-        # Mock this function to avoid DB calls
-        mock_display.return_value = None
-        
-        # Call the CLI with just a topic
-        result = runner.invoke(app, ["--topic", "test_topic"])
-        
-        # Verify _display_topic_details was called
-        mock_display.assert_called_once_with("test_topic")
-
-
-def test_topic_info_with_labels():
+    # Mock this function to avoid DB calls
+    mock_display = MagicMock(return_value=None)
+    monkeypatch.setattr("ailabel.entrypoints.cli._display_topic_details", mock_display)
+
+    # Call the CLI with just a topic
+    runner.invoke(app, ["--topic", "test_topic"], catch_exceptions=False)
+
+    # Verify _display_topic_details was called
+    mock_display.assert_called_once_with("test_topic")
+
+
+def test_topic_info_with_labels(monkeypatch):
     """Test topic info with labels."""
-    with patch("ailabel.entrypoints.cli.topic_exists") as mock_exists, \
-         patch("ailabel.entrypoints.cli.get_label_statistics") as mock_stats:
-        
-        mock_exists.return_value = True
-        mock_stats.return_value = {"positive": 5, "negative": 3}
-        
-        result = runner.invoke(app, ["--topic", "test_topic"])
-        
-        assert 'Topic: "test_topic"' in result.stdout
-        assert "Label statistics:" in result.stdout
-        assert "Total labeled payloads: 8" in result.stdout
-
-
-@patch("ailabel.entrypoints.cli.create_labeled_payload")
-@patch("ailabel.entrypoints.cli.topic_exists")
-def test_label_payload(mock_exists, mock_create):
+    # topic_exists is already stubbed by the autouse mock_topic_exists fixture
+    monkeypatch.setattr("ailabel.db.crud.get_label_statistics", lambda topic_name: _FAKE_STATS)
+
+    result = runner.invoke(app, ["--topic", "test_topic"], catch_exceptions=False)
+
+    assert 'Topic: "test_topic"' in result.stdout
+    assert "Label statistics:" in result.stdout
+    assert "Total labeled payloads: 8" in result.stdout
+
+
+def test_label_payload(cli_mocks):
     """Test labeling a payload."""
-    mock_exists.return_value = True
-    mock_create.return_value = MagicMock(id="test-id")
-    
-    result = runner.invoke(app, ["test payload", "--topic", "test_topic", "--as", "test_label"])
-    
+    result = runner.invoke(
+        app, ["test payload", "--topic", "test_topic", "--as", "test_label"], catch_exceptions=False
+    )
+
     assert result.exit_code == 0
     assert 'Label successfully recorded' in result.stdout
-    mock_create.assert_called_once()
+    cli_mocks.create.assert_called_once()
 
 
-@patch("ailabel.entrypoints.cli.label_payload")
-@patch("ailabel.entrypoints.cli.topic_exists")
-def test_predict_label(mock_exists, mock_predict):
+def test_predict_label(cli_mocks):
     """Test predicting a label."""
-    mock_exists.return_value = True
-    mock_predict.return_value = "predicted_label"
-    
-    result = runner.invoke(app, ["test payload", "--topic", "test_topic"])
-    
+    result = runner.invoke(app, ["test payload", "--topic", "test_topic"], catch_exceptions=False)
+
     assert result.exit_code == 0
     assert "predicted_label" in result.stdout
-    mock_predict.assert_called_once_with("test_topic", "test payload")
+    cli_mocks.predict.assert_called_once_with("test_topic", "test payload", examples=20)
 
 
-@patch("ailabel.entrypoints.cli.topic_exists")
-def test_error_no_payload_with_label(mock_exists):
+def test_error_no_payload_with_label():
     """Test error when no payload is provided but label is."""
-    mock_exists.return_value = True
     
     result = runner.invoke(app, ["--topic", "test_topic", "--as", "test_label"])
     
     assert result.exit_code == 1
-    assert "Error: No payload provided" in result.stdout
\ No newline at end of file
+    assert "Error: No payload provided" in result.stdout
+
+
+@patch("ailabel.predictions.label_payloads_batch")
+def test_predict_async_batch(mock_batch):
+    """Test predicting labels for stdin lines with a batch job."""
+    mock_batch.return_value = ["positive", None, "negative"]
+
+    result = runner.invoke(
+        app, ["-", "--topic", "test_topic", "--async-batch"], input="good\nunclear\n\nbad\n"
+    )
+
+    assert result.exit_code == 0
+    assert result.stdout == "positive\n\nnegative\n"
+    mock_batch.assert_called_once_with("test_topic", ["good", "unclear", "bad"], examples=20)
+
+
+@patch("ailabel.predictions.label_payloads_batch")
+@patch("ailabel.predictions.submit_labeling_batch")
+def test_async_batch_no_wait(mock_submit, mock_batch):
+    """Test that --no-wait prints the batch job name instead of waiting for labels."""
+    mock_submit.return_value = "batches/123"
+
+    result = runner.invoke(
+        app, ["-", "--topic", "test_topic", "--async-batch", "--no-wait"], input="good\nbad\n"
+    )
+
+    assert result.exit_code == 0
+    assert result.stdout.splitlines()[0] == "batches/123"
+    assert "label --job batches/123" in result.output
+    mock_submit.assert_called_once_with("test_topic", ["good", "bad"], examples=20)
+    mock_batch.assert_not_called()
+
+
+@patch("ailabel.predictions.collect_labeling_batch")
+def test_collect_async_batch(mock_collect, mock_ensure_topic):
+    """Test that --job prints the labels of a submitted batch job."""
+    mock_collect.return_value = ["positive", None]
+
+    result = runner.invoke(app, ["--job", "batches/123"])
+
+    assert result.exit_code == 0
+    assert result.stdout == "positive\n\n"
+    mock_collect.assert_called_once_with("batches/123")
+    mock_ensure_topic.assert_not_called()
+
+
+@patch("ailabel.predictions.collect_labeling_batch")
+def test_collect_async_batch_reports_errors(mock_collect):
+    """Test that a failed batch job is reported when collected."""
+    mock_collect.side_effect = RuntimeError("Batch job batches/123 finished with state BATCH_STATE_FAILED")
+
+    result = runner.invoke(app, ["--job", "batches/123"])
+
+    assert result.exit_code == 1
+    assert "Error: Batch job batches/123 finished with state BATCH_STATE_FAILED" in result.output
+
+
+@patch("ailabel.predictions.label_payloads_batch")
+def test_async_batch_requires_stdin(mock_batch, cli_mocks):
+    """Test that --async-batch rejects a positional payload."""
+    result = runner.invoke(app, ["test payload", "--topic", "test_topic", "--async-batch"])
+
+    assert result.exit_code == 1
+    assert "Error: --async-batch predicts labels for stdin lines" in result.output
+    mock_batch.assert_not_called()
+    cli_mocks.create.assert_not_called()
+
+
+@patch("ailabel.predictions.label_payloads_batch")
+def test_async_batch_empty_stdin(mock_batch):
+    """Test that --async-batch doesn't submit a job for blank input."""
+
+    result = runner.invoke(app, ["-", "--topic", "test_topic", "--async-batch"], input="\n  \n")
+
+    assert result.exit_code == 1
+    assert "Error: No payloads provided on stdin" in result.output
+    mock_batch.assert_not_called()
+
+
+@patch("ailabel.predictions.label_payloads_batch")
+def test_async_batch_reports_errors(mock_batch):
+    """Test that --async-batch reports prediction errors without a traceback."""
+    mock_batch.side_effect = ValueError("Topic 'test_topic' has no labels.")
+
+    result = runner.invoke(app, ["-", "--topic", "test_topic", "--async-batch"], input="good\n")
+
+    assert result.exit_code == 1
+    assert "Error: Topic 'test_topic' has no labels." in result.output
+
+
+@patch("ailabel.db.crud.create_labeled_payloads_bulk")
+def test_interactive_labeling(mock_bulk):
+    """Test that interactive labels are committed in batches and flushed on EOF."""
+    mock_bulk.side_effect = len
+
+    result = runner.invoke(
+        app,
+        ["--topic", "test_topic", "--interactive", "--commit-every", "2"],
+        input="a\npositive\nb\nnegative\nc\npositive\n",
+    )
+
+    assert result.exit_code == 0
+    assert 'Recorded 3 labels for topic "test_topic"' in result.stdout
+    assert [len(call.args[0]) for call in mock_bulk.call_args_list] == [2, 1]
+
+
+def _prompts_then(answers, error):
+    """Build a typer.prompt replacement that answers in order, then raises like click does."""
+    answers = iter(answers)
+
+    def prompt(*args, **kwargs):
+        try:
+            return next(answers)
+        except StopIteration:
+            try:
+                raise error
+            except (KeyboardInterrupt, EOFError):
+                raise Abort()
+
+    return prompt
+
+
+@patch("ailabel.db.crud.create_labeled_payloads_bulk")
+def test_interactive_labeling_flushes_on_eof(mock_bulk):
+    """Test that pending labels are committed on EOF and the command exits cleanly."""
+    mock_bulk.side_effect = len
+
+    with patch("ailabel.entrypoints.cli.typer.prompt", _prompts_then(["a", "positive"], EOFError)):
+        result = runner.invoke(app, ["--topic", "test_topic", "--interactive"])
+
+    assert result.exit_code == 0
+    assert 'Recorded 1 labels for topic "test_topic"' in result.stdout
+    mock_bulk.assert_called_once_with([("a", "positive", "test_topic")])
+
+
+@patch("ailabel.db.crud.create_labeled_payloads_bulk")
+def test_interactive_labeling_flushes_on_ctrl_c(mock_bulk):
+    """Test that pending labels are committed on Ctrl-C before exiting with 130."""
+    mock_bulk.side_effect = len
+
+    prompt = _prompts_then(["a", "positive", "b"], KeyboardInterrupt)
+    with patch("ailabel.entrypoints.cli.typer.prompt", prompt):
+        result = runner.invoke(app, ["--topic", "test_topic", "--interactive"])
+
+    assert result.exit_code == 130
+    assert 'Recorded 1 labels for topic "test_topic"' in result.stdout
+    mock_bulk.assert_called_once_with([("a", "positive", "test_topic")])
+
+
+@patch("ailabel.db.crud.create_labeled_payloads_bulk")
+def test_interactive_labeling_reports_unsaved(mock_bulk):
+    """Test that labels lost to a failed commit are reported."""
+    mock_bulk.side_effect = RuntimeError("database is locked")
+
+    result = runner.invoke(app, ["--topic", "test_topic", "--interactive"], input="a\npositive\n\n")
+
+    assert result.exit_code == 1
+    assert "Failed to save 1 labels: database is locked" in result.output
+    assert 'Not saved: "a" -> "positive"' in result.output
+
+
+@patch("ailabel.db.crud.create_labeled_payloads_bulk")
+def test_interactive_rejects_payload(mock_bulk):
+    """Test that --interactive refuses a positional payload or --as."""
+
+    result = runner.invoke(app, ["payload", "--topic", "test_topic", "--as", "x", "--interactive"])
+
+    assert result.exit_code == 1
+    assert "Error: --interactive" in result.output
+    mock_bulk.assert_not_called()
+
+
+@patch("ailabel.db.crud.create_labeled_payloads_bulk")
+def test_batch_labeling(mock_bulk, monkeypatch):
+    """Test that --batch stores stdin lines in fixed-size chunks."""
+    mock_bulk.side_effect = len
+    monkeypatch.setattr("ailabel.entrypoints.cli.BATCH_CHUNK_SIZE", 2)
+
+    result = runner.invoke(
+        app, ["-", "--topic", "test_topic", "--as", "positive", "--batch"], input="a\nb\n\nc\n"
+    )
+
+    assert result.exit_code == 0
+    assert 'Recorded 3 labels as "positive"' in result.stdout
+    assert [call.args[0] for call in mock_bulk.call_args_list] == [
+        [("a", "positive", "test_topic"), ("b", "positive", "test_topic")],
+        [("c", "positive", "test_topic")],
+    ]
+
+
+@patch("ailabel.db.crud.create_labeled_payloads_bulk")
+def test_jsonl_import(mock_bulk):
+    """Test that --jsonl stores every stdin record with one bulk insert."""
+    mock_bulk.side_effect = len
+
+    result = runner.invoke(
+        app,
+        ["-", "--topic", "test_topic", "--jsonl"],
+        input='{"payload": "a", "label": "pos"}\n\n{"payload": "b", "label": "neg"}\n',
+    )
+
+    assert result.exit_code == 0
+    assert 'Recorded 2 labels for topic "test_topic"' in result.output
+    mock_bulk.assert_called_once_with([("a", "pos", "test_topic"), ("b", "neg", "test_topic")])
+
+
+@patch("ailabel.db.crud.create_labeled_payloads_bulk")
+def test_jsonl_import_rejects_bad_lines(mock_bulk):
+    """Test that a malformed --jsonl line stores nothing."""
+    result = runner.invoke(
+        app,
+        ["-", "--topic", "test_topic", "--jsonl"],
+        input='{"payload": "a", "label": "pos"}\n{"payload": "b"}\n',
+    )
+
+    assert result.exit_code == 1
+    assert "Line 2 is not a JSON object" in result.output
+    mock_bulk.assert_not_called()
+
+
+def test_batch_prediction(cli_mocks):
+    """Test that --batch predicts one label per stdin line."""
+    cli_mocks.predict.side_effect = lambda topic, payload, examples: f"label-{payload}"
+
+    result = runner.invoke(app, ["-", "--topic", "test_topic", "--batch"], input="a\nb\n")
+
+    assert result.exit_code == 0
+    assert result.stdout == "label-a\nlabel-b\n"
+
+
+@patch("ailabel.predictions.label_payloads_async")
+def test_batch_prediction_in_parallel(mock_predict_async, monkeypatch):
+    """Test that --parallel predicts each chunk concurrently and keeps input order."""
+    monkeypatch.setattr("ailabel.entrypoints.cli.BATCH_CHUNK_SIZE", 2)
+
+    async def predict(topic, payloads, examples, max_concurrency):
+        return [None if p == "bad" else f"label-{p}" for p in payloads]
+
+    mock_predict_async.side_effect = predict
+
+    result = runner.invoke(
+        app, ["-", "--topic", "test_topic", "--batch", "--parallel", "2"], input="a\nbad\nc\n"
+    )
+
+    assert result.exit_code == 0
+    assert result.stdout == "label-a\n\nlabel-c\n"
+    assert [call.args[1] for call in mock_predict_async.call_args_list] == [["a", "bad"], ["c"]]
+    assert mock_predict_async.call_args.kwargs["max_concurrency"] == 2
+
+
+def test_topic_exists_is_memoized(mock_topic_exists):
+    """Test that repeated topic lookups only query the database once."""
+
+    assert cli._topic_exists("test_topic") is True
+    assert cli._topic_exists("test_topic") is True
+
+    mock_topic_exists.assert_called_once_with(name="test_topic")
+
+
+@patch("ailabel.db.crud.get_label_statistics")
+def test_new_topic_is_created(mock_stats, mock_ensure_topic, mock_topic_exists):
+    """Test that the topic is created up front and the lookup cache is refreshed."""
+    mock_ensure_topic.return_value = True
+    mock_stats.return_value = {}
+    cli._topic_exists("new_topic")
+
+    result = runner.invoke(app, ["--topic", "new_topic"])
+
+    assert result.exit_code == 0
+    mock_ensure_topic.assert_called_once_with(name="new_topic")
+    assert mock_topic_exists.call_count == 2
+
+
+def test_verbose_enables_debug_logging(cli_mocks):
+    """Test that --verbose turns on debug logging for ailabel."""
+    import logging
+
+    logger = logging.getLogger("ailabel")
+    try:
+        result = runner.invoke(app, ["I love it", "--topic", "test_topic", "--verbose"])
+        assert logger.level == logging.DEBUG
+    finally:
+        logger.setLevel(logging.NOTSET)
+
+    assert result.exit_code == 0
+
+
+def test_predict_label_with_examples(cli_mocks):
+    """Test that --examples limits the few-shot examples used for prediction."""
+    result = runner.invoke(app, ["test payload", "--topic", "test_topic", "--examples", "5"])
+
+    assert result.exit_code == 0
+    cli_mocks.predict.assert_called_once_with("test_topic", "test payload", examples=5)
+
+
+@patch("ailabel.db.crud.create_labeled_payloads_bulk")
+def test_interactive_fast_entry(mock_bulk):
+    """Test entering payload<TAB>label pairs on a single line."""
+    mock_bulk.side_effect = len
+
+    result = runner.invoke(
+        app,
+        ["--topic", "test_topic", "--interactive", "--fast-entry"],
+        input="a b\tpositive\nno tab here\nc\tnegative\n\n",
+    )
+
+    assert result.exit_code == 0
+    assert "Expected a payload and a label separated by a tab" in result.output
+    mock_bulk.assert_called_once_with(
+        [("a b", "positive", "test_topic"), ("c", "negative", "test_topic")]
+    )
@@ -0,0 +1,14 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+
+@pytest.fixture
+def mock_gemini_model():
+    """A stand-in Gemini model whose responses are always '{"result": "ok"}'.
+
+    Tests that need a different response replace `generate_content.return_value`.
+    """
+    model = MagicMock()
+    model.generate_content.return_value = SimpleNamespace(text='{"result": "ok"}')
+    return model
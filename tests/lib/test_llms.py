@@ -1,14 +1,30 @@
+import asyncio
 import pytest
 import json
-from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
+from unittest.mock import patch
 
+from ailabel.lib import llms
 from ailabel.lib.llms import (
     get_gemini,
     generate_json,
+    generate_json_async,
+    cache_stats,
+    parse_json_response,
     Models
 )
 
 
+@pytest.fixture(autouse=True)
+def clear_llm_caches():
+    """Keep cached models and responses from one test out of the next."""
+    llms.get_gemini.cache_clear()
+    llms.clear_response_cache()
+    yield
+    llms.get_gemini.cache_clear()
+    llms.clear_response_cache()
+
+
 def test_models_enum():
     """Test the Models enum."""
     assert Models.GEMINI_2_0 == "models/gemini-2.0"
@@ -16,97 +32,238 @@ def test_models_enum():
     assert Models.GEMINI_2_0_FLASH_8B == "models/gemini-2.0-flash-8b"
 
 
-@patch("ailabel.lib.llms.genai.GenerativeModel")
-def test_get_gemini(mock_generative_model):
-    """Test the get_gemini function."""
-    # Set up mock
-    mock_model = MagicMock()
-    mock_generative_model.return_value = mock_model
-    
-    # Call with no system instruction
-    model = get_gemini()
-    assert model == mock_model
-    mock_generative_model.assert_called_once_with(
-        Models.GEMINI_2_0_FLASH,
-        system_instruction=None
-    )
-    
-    # Reset mock
-    mock_generative_model.reset_mock()
-    
-    # Call with system instruction
-    system_instruction = "You are a helpful assistant."
-    model = get_gemini(system_instruction=system_instruction)
-    assert model == mock_model
-    mock_generative_model.assert_called_once_with(
-        Models.GEMINI_2_0_FLASH,
-        system_instruction=system_instruction
-    )
-    
-    # Test caching (the function is decorated with @functools.cache)
-    # If we call get_gemini again with the same system_instruction,
-    # the mock shouldn't be called again
-    mock_generative_model.reset_mock()
-    model = get_gemini(system_instruction=system_instruction)
-    assert model == mock_model
-    mock_generative_model.assert_not_called()
-
-
-@patch("ailabel.lib.llms.get_gemini")
-def test_generate_json_with_prompt_only(mock_get_gemini):
-    """Test the generate_json function with only a prompt."""
-    # Set up mocks
-    mock_model = MagicMock()
-    mock_response = MagicMock()
-    mock_response.text = '{"result": "success"}'
-    mock_model.generate_content.return_value = mock_response
-    mock_get_gemini.return_value = mock_model
-    
-    # Call the function
-    prompt = "Generate a JSON response"
-    result = generate_json(prompt)
-    
-    # Verify the result
-    assert result == {"result": "success"}
-    
-    # Verify the mock calls
-    mock_get_gemini.assert_called_once_with(system_instruction=None)
-    mock_model.generate_content.assert_called_once()
-    # Check that we're using the JSON generation config
-    assert mock_model.generate_content.call_args[1]["generation_config"].response_mime_type == "application/json"
-    assert mock_model.generate_content.call_args[1]["generation_config"].temperature == 0.0
-
-
-@patch("ailabel.lib.llms.get_gemini")
-def test_generate_json_with_history(mock_get_gemini):
-    """Test the generate_json function with history."""
-    # Set up mocks
-    mock_model = MagicMock()
-    mock_response = MagicMock()
-    mock_response.text = '{"result": "with history"}'
-    mock_model.generate_content.return_value = mock_response
-    mock_get_gemini.return_value = mock_model
-    
-    # Call the function with history
+@pytest.mark.parametrize(
+    "system_instruction, cached",
+    [(None, False), ("You are a helpful assistant.", False), ("You are a helpful assistant.", True)],
+)
+@patch("google.generativeai.GenerativeModel")
+def test_get_gemini(mock_generative_model, system_instruction, cached):
+    """Test that get_gemini builds a model once per system instruction."""
+    if cached:
+        expected = get_gemini(system_instruction=system_instruction)
+        mock_generative_model.reset_mock()
+    else:
+        expected = mock_generative_model.return_value
+
+    assert get_gemini(system_instruction=system_instruction) is expected
+    if cached:
+        mock_generative_model.assert_not_called()
+    else:
+        mock_generative_model.assert_called_once_with(
+            Models.GEMINI_2_0_FLASH,
+            system_instruction=system_instruction
+        )
+
+
+@pytest.fixture
+def mock_gemini(mock_gemini_model):
+    """Patch get_gemini to return `mock_gemini_model`."""
+    with patch("ailabel.lib.llms.get_gemini", return_value=mock_gemini_model) as mock_get_gemini:
+        yield mock_get_gemini, mock_gemini_model
+
+
+HISTORY = [
+    {"role": "user", "parts": ["How are you?"]},
+    {"role": "assistant", "parts": ["I'm doing well, thank you!"]},
+]
+
+
+@pytest.mark.parametrize(
+    "history, system_instruction, contents_len",
+    [(None, None, None), (HISTORY, "You are a helpful assistant.", 3)],
+)
+def test_generate_json(mock_gemini, history, system_instruction, contents_len):
+    """Test the generate_json function with and without history."""
+    mock_get_gemini, mock_model = mock_gemini
     prompt = "Generate a JSON response"
-    history = [
-        {"role": "user", "parts": ["How are you?"]},
-        {"role": "assistant", "parts": ["I'm doing well, thank you!"]}
-    ]
-    system_instruction = "You are a helpful assistant."
-    
+
     result = generate_json(prompt, history=history, system_instruction=system_instruction)
-    
-    # Verify the result
-    assert result == {"result": "with history"}
-    
-    # Verify the mock calls
+
+    assert result == {"result": "ok"}
     mock_get_gemini.assert_called_once_with(system_instruction=system_instruction)
     mock_model.generate_content.assert_called_once()
-    
-    # Check that history + new prompt is passed correctly
-    call_args = mock_model.generate_content.call_args[0][0]
-    assert len(call_args) == 3  # 2 from history + 1 new
-    assert call_args[0] == history[0]
-    assert call_args[1] == history[1]
-    assert call_args[2] == {"role": "user", "parts": [prompt]}
\ No newline at end of file
+    # A bare prompt is sent as is; with history, the prompt is appended to it
+    contents = mock_model.generate_content.call_args[0][0]
+    if contents_len is None:
+        assert contents == prompt
+    else:
+        assert len(contents) == contents_len
+        assert contents == history + [{"role": "user", "parts": [prompt]}]
+    # Check that we're using the JSON generation config
+    kwargs = mock_model.generate_content.call_args[1]
+    assert kwargs["generation_config"].response_mime_type == "application/json"
+    assert kwargs["generation_config"].temperature == 0.0
+    # Transient failures are retried
+    assert kwargs["request_options"]["retry"] is not None
+
+
+def test_generate_json_invalid_response(mock_gemini):
+    """Test that a non-JSON response raises ValueError."""
+    _, mock_model = mock_gemini
+    mock_model.generate_content.return_value = SimpleNamespace(text="not json")
+
+    with pytest.raises(ValueError):
+        generate_json("Generate a JSON response")
+
+
+def test_generate_json_caches_responses(mock_gemini):
+    """Test that repeated requests are answered from the response cache."""
+    _, mock_model = mock_gemini
+    mock_model.generate_content.return_value = SimpleNamespace(text='{"label": "positive"}')
+
+    first = generate_json("same prompt", system_instruction="Label it")
+    first["label"] = "mutated"
+    second = generate_json("same prompt", system_instruction="Label it")
+    generate_json("other prompt", system_instruction="Label it")
+    generate_json("same prompt", system_instruction="Label it", use_cache=False)
+
+    assert second == {"label": "positive"}
+    assert mock_model.generate_content.call_count == 3
+    assert cache_stats() == {"hits": 1, "misses": 2, "size": 2, "maxsize": llms.RESPONSE_CACHE_SIZE}
+
+
+def test_generate_json_cache_is_bounded(mock_gemini, monkeypatch):
+    """Test that the least recently used response is evicted first."""
+    monkeypatch.setattr(llms, "RESPONSE_CACHE_SIZE", 2)
+    _, mock_model = mock_gemini
+    mock_model.generate_content.return_value = SimpleNamespace(text="{}")
+
+    for prompt in ["a", "b", "a", "c", "a"]:
+        generate_json(prompt)
+
+    assert cache_stats()["size"] == 2
+    assert cache_stats()["hits"] == 2
+
+
+@patch("ailabel.lib.llms.generate_json")
+def test_generate_json_async(mock_generate_json):
+    """Test that generate_json_async delegates to generate_json."""
+    mock_generate_json.return_value = {"label": "positive"}
+
+    result = asyncio.run(generate_json_async("prompt", system_instruction="Label it"))
+
+    assert result == {"label": "positive"}
+    mock_generate_json.assert_called_once_with("prompt", history=None, system_instruction="Label it")
+
+
+@patch("ailabel.lib.llms.generate_json")
+def test_generate_json_async_coalesces_duplicates(mock_generate_json):
+    """Test that identical concurrent requests share a single model call."""
+    mock_generate_json.side_effect = lambda prompt, **kwargs: {"label": prompt}
+
+    async def run():
+        return await asyncio.gather(
+            generate_json_async("same", system_instruction="Label it"),
+            generate_json_async("same", system_instruction="Label it"),
+            generate_json_async("other", system_instruction="Label it"),
+        )
+
+    results = asyncio.run(run())
+
+    assert results == [{"label": "same"}, {"label": "same"}, {"label": "other"}]
+    assert mock_generate_json.call_count == 2
+
+
+@patch("ailabel.lib.llms.generate_json")
+def test_generate_json_async_coalesced_errors(mock_generate_json):
+    """Test that a failed request raises for every coalesced caller."""
+    mock_generate_json.side_effect = ValueError("not json")
+
+    async def run():
+        return await asyncio.gather(
+            generate_json_async("same"), generate_json_async("same"), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert mock_generate_json.call_count == 1
+
+
+@patch("google.generativeai.GenerativeModel")
+def test_get_gemini_cache_is_bounded(mock_generative_model):
+    """Test that get_gemini evicts the least recently used model."""
+    for i in range(65):
+        get_gemini(system_instruction=f"instruction {i}")
+
+    assert get_gemini.cache_info().currsize == 64
+    get_gemini(system_instruction="instruction 0")
+    assert mock_generative_model.call_count == 66
+
+
+def test_request_options_retry_transient_errors():
+    """Test that only rate limits and transient server errors are retried."""
+    from google.api_core import exceptions
+
+    retry = llms.request_options()["retry"]
+
+    assert retry._predicate(exceptions.ResourceExhausted("rate limited"))
+    assert retry._predicate(exceptions.ServiceUnavailable("unavailable"))
+    assert not retry._predicate(exceptions.InvalidArgument("bad request"))
+
+
+@patch("google.generativeai.configure")
+def test_genai_transport_is_configurable(mock_configure, monkeypatch):
+    """Test that the Gemini transport comes from AILABEL_GEMINI_TRANSPORT."""
+    monkeypatch.setattr(llms, "GEMINI_TRANSPORT", "rest")
+    llms._genai.cache_clear()
+    try:
+        llms._genai()
+    finally:
+        llms._genai.cache_clear()
+
+    mock_configure.assert_called_once_with(api_key=llms.api_key, transport="rest")
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"label": "positive"}', {"label": "positive"}),
+        (' {\n  "label" : "spam" }\n', {"label": "spam"}),
+        ('{"label": "say \\"hi\\""}', {"label": 'say "hi"'}),
+        ('{"label": "x", "confidence": 0.9}', {"label": "x", "confidence": 0.9}),
+        ('[1, 2]', [1, 2]),
+    ],
+)
+def test_parse_json_response(text, expected):
+    """Test the label fast path and the full-parse fallback."""
+    assert parse_json_response(text) == expected
+
+
+def test_parse_json_response_invalid():
+    """Test that invalid JSON raises ValueError."""
+    with pytest.raises(ValueError):
+        parse_json_response('{"label": "unterminated')
+
+
+def test_importing_llms_does_not_load_sdk():
+    """Test that the Gemini SDK is only imported once a model is needed."""
+    import subprocess
+    import sys
+
+    code = "import sys, ailabel.lib.llms; print('google.generativeai' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+
+def test_gemini_model_from_environment():
+    """Test that AILABEL_GEMINI_MODEL selects the model, with or without the models/ prefix."""
+    import os
+    import subprocess
+    import sys
+
+    code = "import ailabel.lib.llms as llms; print(llms.GEMINI_MODEL)"
+    env = {**os.environ, "AILABEL_GEMINI_MODEL": "gemini-2.0-flash-8b"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+    assert result.stdout.strip() == "models/gemini-2.0-flash-8b"
+
+
+def test_env_files_skipped_when_key_exported(monkeypatch):
+    """Test that .env files aren't read when an API key is already in the environment."""
+    monkeypatch.delenv("_AILABEL_ENV_LOADED", raising=False)
+    monkeypatch.setenv("GEMINI_API_KEY", "exported-key")
+
+    with patch("dotenv.load_dotenv") as mock_load_dotenv:
+        llms._load_env()
+
+    mock_load_dotenv.assert_not_called()
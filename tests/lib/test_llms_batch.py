@@ -0,0 +1,112 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+from ailabel.lib.llms_batch import generate_json_batch, poll_batch, submit_batch
+
+
+def _response(body):
+    response = MagicMock()
+    response.json.return_value = body
+    return response
+
+
+def _inlined(key, text):
+    return {
+        "metadata": {"key": key},
+        "response": {"candidates": [{"content": {"parts": [{"text": text}]}}]},
+    }
+
+
+@patch("ailabel.lib.llms_batch.time.sleep")
+@patch("ailabel.lib.llms_batch._session")
+def test_generate_json_batch(mock_session, mock_sleep):
+    """Test submitting a batch job, polling it, and reordering the results."""
+    mock_session.post.return_value = _response({"name": "batches/123"})
+    mock_session.get.side_effect = [
+        _response({"metadata": {"state": "BATCH_STATE_RUNNING"}}),
+        _response(
+            {
+                "metadata": {"state": "BATCH_STATE_SUCCEEDED"},
+                "response": {
+                    "inlinedResponses": {
+                        "inlinedResponses": [
+                            _inlined("line_1", '{"label": "negative"}'),
+                            {"metadata": {"key": "line_2"}, "error": {"code": 500}},
+                            {
+                                "metadata": {"key": "line_3"},
+                                "response": {"candidates": [{"finishReason": "SAFETY"}]},
+                            },
+                            _inlined("line_4", "not json"),
+                            _inlined("line_0", '{"label": "positive"}'),
+                        ]
+                    }
+                },
+            }
+        ),
+    ]
+    history = [
+        {"role": "user", "parts": ["great"]},
+        {"role": "assistant", "parts": ['{"label": "positive"}']},
+    ]
+
+    results = generate_json_batch(
+        ["good", "bad", "error", "blocked", "garbled"],
+        history=history,
+        system_instruction="Label it",
+        poll_interval=0,
+    )
+
+    assert results == [{"label": "positive"}, {"label": "negative"}, None, None, None]
+    assert mock_sleep.call_count == 1
+
+    assert mock_session.post.call_args[1]["timeout"] > 0
+    assert mock_session.get.call_args[1]["timeout"] > 0
+
+    body = mock_session.post.call_args[1]["json"]
+    batch_requests = body["batch"]["input_config"]["requests"]["requests"]
+    assert len(batch_requests) == 5
+    assert batch_requests[0]["metadata"] == {"key": "line_0"}
+    request = batch_requests[0]["request"]
+    assert request["system_instruction"] == {"parts": [{"text": "Label it"}]}
+    assert request["contents"][1] == {"role": "model", "parts": [{"text": '{"label": "positive"}'}]}
+    assert request["contents"][2] == {"role": "user", "parts": [{"text": "good"}]}
+
+
+@patch("ailabel.lib.llms_batch._session")
+def test_generate_json_batch_failed_job(mock_session):
+    """Test that a failed batch job raises."""
+    mock_session.post.return_value = _response({"name": "batches/123"})
+    mock_session.get.return_value = _response({"metadata": {"state": "BATCH_STATE_FAILED"}})
+
+    with pytest.raises(RuntimeError, match="BATCH_STATE_FAILED"):
+        generate_json_batch(["good"])
+
+
+@patch("ailabel.lib.llms_batch.time.sleep")
+@patch("ailabel.lib.llms_batch._session")
+def test_generate_json_batch_max_wait(mock_session, mock_sleep):
+    """Test that a job that never finishes raises after max_wait."""
+    mock_session.post.return_value = _response({"name": "batches/123"})
+    mock_session.get.return_value = _response({"metadata": {"state": "BATCH_STATE_PENDING"}})
+
+    with pytest.raises(RuntimeError, match="did not finish"):
+        generate_json_batch(["good"], poll_interval=0, max_wait=0)
+
+
+@patch("ailabel.lib.llms_batch._session")
+def test_submit_then_poll_batch(mock_session):
+    """Test submitting a job and collecting it separately."""
+    mock_session.post.return_value = _response({"name": "batches/456"})
+    mock_session.get.return_value = _response(
+        {
+            "metadata": {"state": "BATCH_STATE_SUCCEEDED"},
+            "response": {"inlinedResponses": {"inlinedResponses": [_inlined("line_0", '{"label": "x"}')]}},
+        }
+    )
+
+    batch_name = submit_batch(["good"])
+    mock_session.get.assert_not_called()
+
+    assert batch_name == "batches/456"
+    assert poll_batch(batch_name) == [{"label": "x"}]
+    assert mock_session.get.call_args[0][0].endswith("/batches/456")
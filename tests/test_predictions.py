@@ -0,0 +1,204 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import patch
+
+from ailabel import predictions
+from ailabel.predictions import label_payload, label_payloads_async
+
+
+@pytest.fixture(autouse=True)
+def clear_prediction_caches():
+    """Reset per-topic caches so tests don't see each other's topics."""
+    predictions.clear_classifiers()
+
+
+@patch("ailabel.predictions.generate_json")
+@patch("ailabel.predictions.get_recent_examples")
+@patch("ailabel.predictions.get_label_statistics")
+def test_label_payload(mock_stats, mock_recent, mock_generate):
+    """Test predicting a label from recent examples."""
+    mock_stats.return_value = {"positive": 2, "negative": 1}
+    mock_recent.return_value = [("great", "positive")]
+    mock_generate.return_value = {"label": "positive"}
+
+    assert label_payload("sentiment", "I love it") == "positive"
+
+    history = mock_generate.call_args[1]["history"]
+    assert history[0] == {"role": "user", "parts": ["great"]}
+    assert len(history) == 2
+
+
+@patch("ailabel.predictions.generate_json")
+@patch("ailabel.predictions.get_recent_examples")
+@patch("ailabel.predictions.get_label_statistics")
+def test_label_payload_logs_instead_of_printing(mock_stats, mock_recent, mock_generate, capsys, caplog):
+    """Test that prompts and raw predictions go to the debug log, not stdout."""
+    mock_stats.return_value = {"positive": 1}
+    mock_recent.return_value = []
+    mock_generate.return_value = {"label": "positive"}
+
+    with caplog.at_level("DEBUG", logger="ailabel.predictions"):
+        label_payload("sentiment", "I love it")
+
+    assert capsys.readouterr().out == ""
+    assert "Predicted label: {'label': 'positive'}" in caplog.text
+
+
+@patch("ailabel.predictions.generate_json")
+@patch("ailabel.predictions.get_recent_examples")
+@patch("ailabel.predictions.get_label_statistics")
+def test_label_payload_reuses_topic_context(mock_stats, mock_recent, mock_generate):
+    """Test that repeated predictions on a topic only query the database once."""
+    mock_stats.return_value = {"positive": 2, "negative": 1}
+    mock_recent.return_value = []
+    mock_generate.return_value = {"label": "negative"}
+
+    for payload in ["one", "two", "three"]:
+        label_payload("sentiment", payload)
+
+    mock_stats.assert_called_once_with("sentiment")
+    mock_recent.assert_called_once_with("sentiment", limit=20 * predictions.EXAMPLE_POOL_FACTOR)
+    assert mock_generate.call_count == 3
+
+
+@patch("ailabel.predictions.get_recent_examples")
+@patch("ailabel.predictions.get_label_statistics")
+def test_label_payload_without_labels(mock_stats, mock_recent):
+    """Test that predicting on an unlabeled topic raises."""
+    mock_stats.return_value = {}
+    mock_recent.return_value = []
+
+    with pytest.raises(ValueError, match="has no labels"):
+        label_payload("empty", "payload")
+
+
+@patch("ailabel.predictions.generate_json")
+@patch("ailabel.predictions.get_recent_examples")
+@patch("ailabel.predictions.get_label_statistics")
+@patch("ailabel.predictions.labeled_payloads_version")
+def test_label_payload_sees_new_labels(mock_version, mock_stats, mock_recent, mock_generate):
+    """Test that an unlabeled topic isn't cached and new labels invalidate the context."""
+    mock_version.return_value = 0
+    mock_stats.return_value = {}
+    mock_recent.return_value = []
+    mock_generate.return_value = {"label": "positive"}
+
+    with pytest.raises(ValueError, match="has no labels"):
+        label_payload("sentiment", "payload")
+
+    mock_stats.return_value = {"positive": 1, "negative": 1}
+    assert label_payload("sentiment", "payload") == "positive"
+
+    mock_version.return_value = 1
+    mock_recent.return_value = [("great", "positive")]
+    label_payload("sentiment", "payload")
+
+    assert len(mock_generate.call_args[1]["history"]) == 2
+
+
+@patch("ailabel.predictions.generate_json")
+@patch("ailabel.predictions.get_recent_examples")
+@patch("ailabel.predictions.get_label_statistics")
+def test_label_payload_escapes_example_labels(mock_stats, mock_recent, mock_generate):
+    """Test that example labels are JSON-encoded in the few-shot history."""
+    mock_stats.return_value = {'say "hi"': 1, "other": 1}
+    mock_recent.return_value = [("hello", 'say "hi"')]
+    mock_generate.return_value = {"label": "other"}
+
+    label_payload("greetings", "hey")
+
+    history = mock_generate.call_args[1]["history"]
+    assert json.loads(history[1]["parts"][0]) == {"label": 'say "hi"'}
+    system_instruction = mock_generate.call_args[1]["system_instruction"]
+    assert 'possible labels: "say \\"hi\\"", "other".' in system_instruction
+
+
+@patch("ailabel.predictions.generate_json")
+@patch("ailabel.predictions.get_recent_examples")
+@patch("ailabel.predictions.get_label_statistics")
+def test_label_payload_with_single_label(mock_stats, mock_recent, mock_generate):
+    """Test that a topic with a single label still renders a system instruction."""
+    mock_stats.return_value = {"spam": 3}
+    mock_recent.return_value = []
+    mock_generate.return_value = {"label": "spam"}
+
+    assert label_payload("inbox", "buy now") == "spam"
+
+    system_instruction = mock_generate.call_args[1]["system_instruction"]
+    assert 'possible labels: "spam".' in system_instruction
+    assert system_instruction.endswith('{ "label": "spam" }')
+
+
+@patch("ailabel.predictions.generate_json_async")
+@patch("ailabel.predictions.get_recent_examples")
+@patch("ailabel.predictions.get_label_statistics")
+def test_label_payloads_async(mock_stats, mock_recent, mock_generate):
+    """Test concurrent predictions share one context and stay within the concurrency limit."""
+    mock_stats.return_value = {"positive": 1, "negative": 1}
+    mock_recent.return_value = []
+    in_flight = peak = 0
+
+    async def generate(payload, history, system_instruction):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        if payload == "bad":
+            raise ValueError("not json")
+        return {"label": f"label-{payload}"}
+
+    mock_generate.side_effect = generate
+
+    labels = asyncio.run(label_payloads_async("sentiment", ["a", "bad", "c", "d"], max_concurrency=2))
+
+    assert labels == ["label-a", None, "label-c", "label-d"]
+    assert peak == 2
+    mock_stats.assert_called_once_with("sentiment")
+
+
+@patch("ailabel.predictions.generate_json")
+@patch("ailabel.predictions.get_recent_examples")
+@patch("ailabel.predictions.get_label_statistics")
+def test_classifier_expires_after_ttl(mock_stats, mock_recent, mock_generate, monkeypatch):
+    """Test that a cached classifier is rebuilt once its TTL has passed."""
+    mock_stats.return_value = {"positive": 1}
+    mock_recent.return_value = []
+    mock_generate.return_value = {"label": "positive"}
+    now = 1000.0
+    monkeypatch.setattr(predictions.time, "monotonic", lambda: now)
+
+    first = predictions.get_classifier("sentiment")
+    assert predictions.get_classifier("sentiment") is first
+
+    now += predictions.CLASSIFIER_TTL + 1
+    assert predictions.get_classifier("sentiment") is not first
+    assert mock_stats.call_count == 2
+
+
+@patch("ailabel.predictions.generate_json")
+@patch("ailabel.predictions.get_recent_examples")
+@patch("ailabel.predictions.get_label_statistics")
+def test_examples_are_spread_across_labels(mock_stats, mock_recent, mock_generate, monkeypatch):
+    """Test that examples alternate between labels, are capped per label and truncated."""
+    monkeypatch.setattr(predictions, "MAX_EXAMPLES_PER_LABEL", 2)
+    monkeypatch.setattr(predictions, "MAX_CHARS_PER_EXAMPLE", 20)
+    mock_stats.return_value = {"spam": 4, "ham": 1}
+    mock_recent.return_value = [
+        ("spam 1", "spam"),
+        ("spam 2", "spam"),
+        ("spam 3", "spam"),
+        ("a very long ham payload that goes on", "ham"),
+        ("spam 4", "spam"),
+    ]
+    mock_generate.return_value = {"label": "spam"}
+
+    label_payload("inbox", "buy now", examples=4)
+
+    history = mock_generate.call_args[1]["history"]
+    assert [message["parts"][0] for message in history[::2]] == [
+        "spam 1",
+        "a very long ham ...",
+        "spam 2",
+    ]